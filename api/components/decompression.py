@@ -0,0 +1,71 @@
+import io
+import zlib
+
+from django.core.exceptions import BadRequest, RequestDataTooBig
+
+# zlib window bits of every accepted Content-Encoding, +32 detects a zlib or
+# gzip header and also accepts deflate bodies sent gzip wrapped.
+ENCODINGS = {'gzip': 16 + zlib.MAX_WBITS, 'x-gzip': 16 + zlib.MAX_WBITS, 'deflate': 32 + zlib.MAX_WBITS}
+READ_SIZE = 64 * 1024
+
+
+class DecompressingStream(io.RawIOBase):
+    """
+    Raw stream inflating a compressed body as it is read.
+
+    At most READ_SIZE compressed bytes are read and one requested buffer is
+    inflated at a time, and reading past max_size raises RequestDataTooBig.
+    A gzip body may hold several members, which are inflated one after the
+    other, other trailing data is rejected.
+    """
+
+    def __init__(self, stream, encoding: str, max_size: int):
+        self.stream = stream
+        self.max_size = max_size
+        self.size = 0
+        self._wbits = ENCODINGS[encoding]
+        self._multi_member = encoding != 'deflate'
+        self._decompressor = zlib.decompressobj(self._wbits)
+        self._input = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        while True:
+            if self._decompressor.eof:
+                self._input = self._decompressor.unused_data or self.stream.read(READ_SIZE)
+                if not self._input:
+                    return 0
+                if not self._multi_member:
+                    raise BadRequest('Compressed request body has trailing data')
+                self._decompressor = zlib.decompressobj(self._wbits)
+            if not self._input:
+                self._input = self.stream.read(READ_SIZE)
+                if not self._input:
+                    raise BadRequest('Compressed request body is truncated')
+            try:
+                chunk = self._decompressor.decompress(self._input, len(buffer))
+            except zlib.error as e:
+                raise BadRequest(f'Invalid compressed request body: {e}')
+            self._input = self._decompressor.unconsumed_tail
+            if chunk:
+                self.size += len(chunk)
+                if self.size > self.max_size:
+                    raise RequestDataTooBig(f'Decompressed request body exceeds {self.max_size} bytes')
+                buffer[:len(chunk)] = chunk
+                return len(chunk)
+
+    def readall(self) -> bytes:
+        chunks = []
+        buffer = bytearray(16 * READ_SIZE)
+        while size := self.readinto(buffer):
+            chunks.append(bytes(buffer[:size]))
+        return b''.join(chunks)
+
+
+def decompressed(stream, encoding: str, max_size: int) -> io.BufferedReader:
+    """
+    Buffered file-like object over the inflated body of stream.
+    """
+    return io.BufferedReader(DecompressingStream(stream, encoding, max_size), buffer_size=READ_SIZE)
@@ -0,0 +1,145 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from api.components.element_query import BOUNDS_FIELDS, point_bounds
+from api.components.instrumentation import stage
+from management.models import Element
+
+IDENTITY_FIELDS = ('element_name', 'coord_x', 'coord_y', 'coord_z', 'rotation')
+ELEMENT_FIELDS = {f.name: f for f in Element._meta.concrete_fields if f.name not in ('id', 'project', *BOUNDS_FIELDS)}
+
+
+def element_values(element_data: dict) -> dict:
+    """
+    Convert request values of known element fields to python values.
+    """
+    missing = [x for x in IDENTITY_FIELDS if x not in element_data]
+    if missing:
+        raise ValidationError({x: 'This field is required.' for x in missing})
+
+    values = {}
+    errors = {}
+    for key, value in element_data.items():
+        if key not in ELEMENT_FIELDS:
+            continue
+        try:
+            values[key] = ELEMENT_FIELDS[key].to_python(value)
+        except ValidationError as e:
+            errors[key] = e.messages
+    if errors:
+        raise ValidationError(errors)
+    if not values['element_name']:
+        raise ValidationError({'element_name': 'This field may not be blank.'})
+    return values
+
+
+def element_identity(values) -> tuple:
+    if isinstance(values, Element):
+        return tuple(getattr(values, x) for x in IDENTITY_FIELDS)
+    return tuple(values[x] for x in IDENTITY_FIELDS)
+
+
+def upsert_elements(project, elements_data: list, batch_size: int) -> dict:
+    """
+    Create or update project elements with a few batched queries.
+
+    An element is matched by its full identity first, then by name like
+    update_or_create. Entries are applied in order, so a repeated element
+    updates the instance created or moved by an earlier entry.
+    """
+    prepared = []
+    failed = []
+    for id_e, element_data in enumerate(elements_data):
+        try:
+            prepared.append((id_e, element_values(element_data)))
+        except ValidationError as e:
+            failed.append({'index': id_e, 'element_name': element_data.get('element_name'), 'errors': e.message_dict})
+
+    names = list({values['element_name'] for _, values in prepared})
+    by_identity = {}
+    by_name = {}
+    with stage('db_fetch'):
+        for id_n in range(0, len(names), batch_size):
+            for element in Element.objects.filter(project=project, element_name__in=names[id_n:id_n + batch_size]):
+                by_identity.setdefault(element_identity(element), element)
+                by_name.setdefault(element.element_name, []).append(element)
+
+    created = {}
+    updated = {}
+    update_fields = set()
+    for id_e, values in prepared:
+        element = by_identity.get(element_identity(values))
+        if element is None:
+            named = by_name.get(values['element_name'], [])
+            if len(named) > 1:
+                failed.append({'index': id_e, 'element_name': values['element_name'],
+                               'errors': {'element_name': ['Multiple elements match this name.']}})
+                continue
+            element = named[0] if named else None
+
+        if element is None:
+            element = Element(project=project, **values)
+            point_bounds(element)
+            created[id(element)] = element
+            by_name[element.element_name] = [element]
+        else:
+            by_identity.pop(element_identity(element), None)
+            position = (element.coord_x, element.coord_y)
+            for key, value in values.items():
+                setattr(element, key, value)
+            # Bounds follow the insertion point until a relocation stores the footprint.
+            moved = position != (element.coord_x, element.coord_y) or element.min_x is None
+            if moved:
+                point_bounds(element)
+            if id(element) not in created:
+                updated[id(element)] = element
+                update_fields.update(values)
+                if moved:
+                    update_fields.update(BOUNDS_FIELDS)
+        by_identity[element_identity(element)] = element
+
+    with stage('db_write'), transaction.atomic():
+        Element.objects.bulk_create(created.values(), batch_size=batch_size)
+        if updated:
+            Element.objects.bulk_update(updated.values(), sorted(update_fields), batch_size=batch_size)
+
+    failed.sort(key=lambda x: x['index'])
+    return {'created': len(created), 'updated': len(updated), 'failed': len(failed), 'errors': failed}
+
+
+def delete_elements(project, elements_data: list, batch_size: int) -> dict:
+    """
+    Delete project elements by identity in one transaction.
+
+    Like upsert_elements, candidates are fetched by name in batches and
+    matched on their full identity, then deleted by id in batches. Returns
+    the outcome of every entry: deleted, not_found or invalid.
+    """
+    outcomes = []
+    identities = {}
+    for id_e, element_data in enumerate(elements_data):
+        outcome = {'index': id_e, 'element_name': element_data.get('element_name')}
+        try:
+            identity = element_identity(element_values({x: element_data[x] for x in IDENTITY_FIELDS if x in element_data}))
+        except ValidationError as e:
+            outcome |= {'status': 'invalid', 'errors': e.message_dict}
+        else:
+            identities.setdefault(identity, []).append(outcome)
+        outcomes.append(outcome)
+
+    names = list({identity[0] for identity in identities})
+    ids = []
+    with stage('db_delete'), transaction.atomic():
+        for id_n in range(0, len(names), batch_size):
+            for id_e, *identity in Element.objects.filter(project=project, element_name__in=names[id_n:id_n + batch_size]) \
+                    .values_list('id', *IDENTITY_FIELDS):
+                for outcome in identities.get(tuple(identity), []):
+                    outcome['status'] = 'deleted'
+                if tuple(identity) in identities:
+                    ids.append(id_e)
+        for id_e in range(0, len(ids), batch_size):
+            Element.objects.filter(id__in=ids[id_e:id_e + batch_size]).delete()
+
+    for outcome in outcomes:
+        outcome.setdefault('status', 'not_found')
+    statuses = [x['status'] for x in outcomes]
+    return {'deleted': len(ids), 'not_found': statuses.count('not_found'), 'failed': statuses.count('invalid'), 'elements': outcomes}
@@ -0,0 +1,72 @@
+from django.core.exceptions import ValidationError
+from api.components.instrumentation import stage
+from management.models import Element
+
+LISTING_FIELDS = {f.name: f for f in Element._meta.concrete_fields}
+STATUS_FIELDS = ('production_status', 'transport_status', 'assembly_status')
+DATE_FIELDS = ('production_date', 'transport_date', 'planned_assembly_date', 'assembly_date')
+DATE_LOOKUPS = ('gte', 'lte')
+
+
+def listing_filters(params: dict) -> dict:
+    """
+    Queryset filters of status and date parameters.
+
+    A status matches any of its comma separated values, dates are bounded
+    with <field>__gte and <field>__lte.
+    """
+    filters = {}
+    errors = {}
+    for name in STATUS_FIELDS:
+        if params.get(name):
+            filters[f'{name}__in'] = params[name].split(',')
+    for name in DATE_FIELDS:
+        for lookup in DATE_LOOKUPS:
+            key = f'{name}__{lookup}'
+            if params.get(key):
+                try:
+                    filters[key] = LISTING_FIELDS[name].to_python(params[key])
+                except ValidationError as e:
+                    errors[key] = e.messages
+    if errors:
+        raise ValidationError(errors)
+    return filters
+
+
+def listing_fields(fields: str) -> list:
+    """
+    Projected field names, the id is always included as it is the cursor.
+    """
+    if not fields:
+        return list(LISTING_FIELDS)
+    names = [x.strip() for x in fields.split(',') if x.strip()]
+    unknown = [x for x in names if x not in LISTING_FIELDS]
+    if unknown:
+        raise ValidationError({'fields': [f'Unknown field {x}.' for x in unknown]})
+    return ['id', *dict.fromkeys(x for x in names if x != 'id')]
+
+
+def element_page(project, params: dict, page_size: int, max_page_size: int) -> dict:
+    """
+    Return one page of project elements in id order after the cursor.
+
+    The page is a single range query on (project, id) fetching only the
+    projected columns, so deep pages cost the same as the first one. The
+    next cursor is the last id, or None on the last page.
+    """
+    try:
+        after = int(params.get('after') or 0)
+        limit = min(int(params.get('limit') or page_size), max_page_size)
+    except ValueError:
+        raise ValidationError({'after': 'after and limit must be integers.'})
+    if limit < 1:
+        raise ValidationError({'limit': 'limit must be positive.'})
+
+    fields = listing_fields(params.get('fields'))
+    queryset = Element.objects.filter(project=project, id__gt=after, **listing_filters(params))
+    with stage('db_fetch'):
+        elements = list(queryset.order_by('id').values(*fields)[:limit + 1])
+
+    more = len(elements) > limit
+    elements = elements[:limit]
+    return {'elements': elements, 'next': elements[-1]['id'] if more else None}
@@ -1,7 +1,19 @@
-from shapely import affinity, LineString, Point, Polygon
-from functools import wraps
+import numpy as np
+import shapely
+from shapely import GeometryType, STRtree
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import copy_context
+from functools import cache, wraps
+import copy
+from itertools import islice
+from typing import Iterable
+import threading
 import time
 
+from api.components.instrumentation import count, stage
+from api.components.orthogonal_grid import orthogonal_grid
+from api.components.zone_cache import grid_key, ZoneCache
+
 def measure_execution_time(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -15,58 +27,242 @@ def measure_execution_time(func):
 
 AREA_SIZE = {'mm': 1000, 'm': 1}
 MAX_SIZE = 2*15
+ZONE_CACHE_SIZE = 64
+STAGES = ('point', 'line', 'area')
+STREAM_CHUNK_SIZE = 1000
 
+zone_cache = ZoneCache(ZONE_CACHE_SIZE)
 
-def process_data(data: dict):
-    elements = elements_geometry(data['elements'])
-    elements_with_location = []
-    for b_name, b_data in data['buildings'].items():
+
+def process_data(data: dict, cache: ZoneCache = zone_cache, executor: Executor = None):
+    """
+    Locate elements building by building, in point, line and area stages.
+
+    Buildings are checked in order and an element belongs to the first one that
+    locates it. With an executor every building runs at once on the elements
+    within its grid extent and the results are merged in the same order.
+    """
+    with stage('elements_geometry'):
+        elements = elements_geometry(data['elements'])
+    count('elements', len(elements))
+    with stage('unit_recognition'):
         unit = unit_recognition(data)
-        axis_intersections = intersection_recognition(b_data)
-
-        # point analyze
-        elements_found, elements = zone_analyze(elements, axis_intersections, unit, b_name, quad_segs=3)
-        if elements_found:
-            elements_with_location += elements_found
-        if not elements:
-            return elements_with_location
-        
-        line_zones, area_zones = line_area_recognition(axis_intersections, unit)
-                   
-        # line analyze
-        elements_found, elements = zone_analyze(elements, line_zones, unit, b_name)
-        if elements_found:
-            elements_with_location += elements_found
-        if not elements:
-            return elements_with_location               
-                       
-        # area analyze
-        elements_found, elements = zone_analyze(elements, area_zones, unit, b_name)
-        if elements_found:
-            elements_with_location += elements_found
-        if not elements:
-            return elements_with_location
-
-        return elements_with_location + [[x, 'Not found', ('Not found', None)] for x in elements]
-
-def elements_geometry(elements: dict) -> dict:
-    """
-    Convert input data to dict of element geometry.
-    """
-    elements_data = []
-
-    for element_data in elements:
-        if 'size' in element_data:
-            p1 = Point(element_data['coords'])
-            p2 = affinity.affine_transform(p1, [1, 0, 0, 0, 1, 0, 0, 0, 1, element_data['size'][0], 0, 0])
-            p3 = affinity.affine_transform(p1, [1, 0, 0, 0, 1, 0, 0, 0, 1, element_data['size'][0], element_data['size'][1], 0])
-            p4 = affinity.affine_transform(p1, [1, 0, 0, 0, 1, 0, 0, 0, 1, 0, element_data['size'][1], 0])
-            geometry = affinity.rotate(Polygon([p1, p2, p3, p4]), element_data['rotation'][0], origin=p1)
-            elements_data.append([element_data["element_name"], geometry])
-        elif 'boundary' in element_data:
-            elements_data.append([element_data["element_name"], Polygon(element_data["boundary"])])
-
-    return elements_data
+    buildings = list(data['buildings'].items())
+
+    located = []
+    if executor is None:
+        for b_name, b_data in buildings:
+            if not elements.unresolved.any():
+                break
+            located.append(building_analyze(elements, b_name, b_data, unit, cache))
+    else:
+        # Every building gets its own unresolved mask, limited to the elements
+        # its zones can reach. Worker processes use their own zone cache,
+        # threads share it and the request metrics of the caller.
+        views = [elements.view(grid_extent(b_data, unit)) for _, b_data in buildings]
+        count('building_candidates', int(sum(view.unresolved.sum() for view in views)))
+        if isinstance(executor, ProcessPoolExecutor):
+            futures = [executor.submit(building_analyze, view, b_name, b_data, unit)
+                       for view, (b_name, b_data) in zip(views, buildings)]
+        else:
+            futures = [executor.submit(copy_context().run, building_analyze, view, b_name, b_data, unit, cache)
+                       for view, (b_name, b_data) in zip(views, buildings)]
+        with stage('buildings'):
+            for future in futures:
+                stages = [[(i, loc) for i, loc in located_stage if elements.unresolved[i]] for located_stage in future.result()]
+                for located_stage in stages:
+                    elements.resolve([i for i, _ in located_stage])
+                located.append(stages)
+
+    elements_with_location = []
+    for (b_name, _), stages in zip(buildings, located):
+        for stage_name, located_stage in zip(STAGES, stages):
+            count(f'{stage_name}_located', len(located_stage))
+            elements_with_location += [(elements[i], b_name, loc) for i, loc in located_stage]
+
+    return elements_with_location + [[elements[i], 'Not found', ('Not found', None)] for i in elements.pending().tolist()]
+
+
+def grid_extent(b_data: dict, unit: str):
+    """
+    Bounds of the grid line vertices grown by the zone buffer, or None for an unknown unit.
+
+    Zones are built between axis intersections and buffered by AREA_SIZE, a
+    located element has its centroid inside a zone and so inside this extent.
+    """
+    vertices = np.array([vertex[:2] for axis in b_data['grid_lines'].values() for vertex in axis], dtype=float)
+    if unit not in AREA_SIZE or not len(vertices):
+        return None
+    return (*(vertices.min(axis=0) - AREA_SIZE[unit]), *(vertices.max(axis=0) + AREA_SIZE[unit]))
+
+
+def locate(data: dict, cache: ZoneCache = zone_cache, executor: Executor = None) -> list:
+    """
+    Return [element, building, zone] rows of process_data.
+    """
+    return [[x[0][0], x[1], x[2][0]] for x in process_data(data, cache, executor)]
+
+
+def process_stream(grid: dict, elements: Iterable, chunk_size=STREAM_CHUNK_SIZE, cache: ZoneCache = zone_cache, executor: Executor = None):
+    """
+    Locate a stream of elements against one grid, a chunk at a time.
+
+    Only the current chunk is held in memory, the grid is compiled once
+    through the zone cache and reused by every chunk.
+    """
+    elements = iter(elements)
+    while chunk := list(islice(elements, chunk_size)):
+        yield process_data(grid | {'elements': chunk}, cache, executor)
+
+
+def building_analyze(elements: 'ElementSet', b_name: str, b_data: dict, unit: str, cache: ZoneCache = zone_cache) -> list:
+    """
+    Run the location stages of one building on the unresolved elements.
+
+    Returns (element index, zone) pairs found by each stage.
+    """
+    with stage('grid'):
+        grid = cache.get(grid_key(b_data, unit), lambda: CompiledGrid(b_data, unit))
+
+    # Orthogonal grids locate most elements arithmetically, the rest and
+    # skewed grids go through the Shapely stages.
+    fast_located = [[] for _ in STAGES]
+    if grid.orthogonal is not None and elements.unresolved.any():
+        with stage('orthogonal_analyze'):
+            fast_located = grid.orthogonal.locate(elements, grid.zones)
+        count('orthogonal_found', sum(map(len, fast_located)))
+
+    located = []
+    for stage_name, fast_found in zip(STAGES, fast_located):
+        found = []
+        if elements.unresolved.any():
+            with stage(f'{stage_name}_zones'):
+                zone_set = grid.zones(stage_name)
+            count('zones', len(zone_set))
+            with stage(f'{stage_name}_analyze'):
+                found = [(x[0], x[2]) for x in zone_analyze(elements, zone_set, b_name)]
+        located.append(sorted(fast_found + found, key=lambda x: x[0]))
+
+    return located
+
+
+@cache
+def building_executor(workers: int, kind='thread') -> Executor:
+    """
+    Shared pool for processing buildings concurrently.
+    """
+    if kind == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='building')
+
+
+class ElementSet:
+    """
+    Columnar element store with the values shared by all location stages.
+
+    Centroids, areas and bounds are computed once. Stages only look at the
+    elements still set in the unresolved mask and clear the ones they locate.
+    """
+
+    def __init__(self, names: list, geometries: np.ndarray):
+        self.names = np.array(names, dtype=object)
+        self.geometries = geometries
+        self.centroids = shapely.centroid(geometries)
+        self.areas = shapely.area(geometries)
+        self.bounds = shapely.bounds(geometries).reshape(-1, 4)
+        self.unresolved = np.ones(len(geometries), dtype=bool)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index: int) -> list:
+        return [self.names[index], self.geometries[index]]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def pending(self) -> np.ndarray:
+        return np.flatnonzero(self.unresolved)
+
+    def resolve(self, indices):
+        self.unresolved[indices] = False
+
+    def view(self, extent=None) -> 'ElementSet':
+        """
+        Element set sharing these columns with its own copy of the unresolved mask.
+
+        With an extent (min_x, min_y, max_x, max_y) only elements whose
+        centroid lies inside it stay unresolved.
+        """
+        element_set = copy.copy(self)
+        element_set.unresolved = self.unresolved.copy()
+        if extent is not None:
+            x, y = shapely.get_x(self.centroids), shapely.get_y(self.centroids)
+            element_set.unresolved &= (x >= extent[0]) & (y >= extent[1]) & (x <= extent[2]) & (y <= extent[3])
+        return element_set
+
+
+def elements_geometry(elements: dict) -> ElementSet:
+    """
+    Convert input data to a columnar set of element geometry.
+    """
+    size_ids = [id_e for id_e, e in enumerate(elements) if 'size' in e]
+    boundary_ids = [id_e for id_e, e in enumerate(elements) if 'size' not in e and 'boundary' in e]
+
+    geometries = np.empty(len(elements), dtype=object)
+    if size_ids:
+        geometries[size_ids] = size_geometry([elements[i] for i in size_ids])
+    if boundary_ids:
+        geometries[boundary_ids] = boundary_geometry([elements[i] for i in boundary_ids])
+
+    ids = sorted(size_ids + boundary_ids)
+    return ElementSet([elements[i]["element_name"] for i in ids], geometries[ids])
+
+
+def size_geometry(elements: list) -> np.ndarray:
+    """
+    Build rotated rectangles from element coords, size and rotation in one batch.
+    """
+    origin = np.array([e['coords'][:2] for e in elements], dtype=float)
+    size = np.array([e['size'][:2] for e in elements], dtype=float)
+    angle = np.radians([e['rotation'][0] for e in elements])
+
+    # Same rounding as affinity.rotate, so right angles give exact corners.
+    cosp, sinp = np.cos(angle), np.sin(angle)
+    cosp[np.abs(cosp) < 2.5e-16] = 0.0
+    sinp[np.abs(sinp) < 2.5e-16] = 0.0
+
+    x0, y0 = origin[:, 0:1], origin[:, 1:2]
+    x = x0 + size[:, 0:1] * np.array([0, 1, 1, 0])
+    y = y0 + size[:, 1:2] * np.array([0, 0, 1, 1])
+    cosp, sinp = cosp[:, None], sinp[:, None]
+    xoff = x0 - x0 * cosp + y0 * sinp
+    yoff = y0 - x0 * sinp - y0 * cosp
+
+    corners = np.stack((cosp * x - sinp * y + xoff, sinp * x + cosp * y + yoff), axis=-1)
+    return shapely.polygons(corners)
+
+
+def boundary_geometry(elements: list) -> np.ndarray:
+    """
+    Build boundary polygons through a single ragged array construction.
+    """
+    coords = []
+    ring_offsets = [0]
+    for e in elements:
+        ring = [vertex[:2] for vertex in e['boundary']]
+        if ring and ring[0] != ring[-1]:
+            ring.append(ring[0])
+        if len(ring) < 4:
+            raise ValueError(f"Boundary of {e.get('element_name')} needs at least 3 vertices")
+        coords += ring
+        ring_offsets.append(len(coords))
+
+    return shapely.from_ragged_array(
+        GeometryType.POLYGON,
+        np.array(coords, dtype=float),
+        (np.array(ring_offsets), np.arange(len(elements) + 1)),
+    )
 
 
 def unit_recognition(data: dict) -> str:
@@ -101,114 +297,303 @@ def intersection_recognition(b_data: dict) -> list:
     """
     Identify all axis intersections.
     """
-    intersections = []
-    processed_combinations = set()
-
     grid_lines = b_data['grid_lines']
+    names = list(grid_lines)
+    if len(names) < 2:
+        return []
 
-    for axis1_name, axis1_data in grid_lines.items():
-        for axis2_name, axis2_data in grid_lines.items():
-            if axis1_name != axis2_name:
-                    
-                combination1 = (axis1_name, axis2_name)
-                combination2 = (axis2_name, axis1_name)
-                if combination1 in processed_combinations or combination2 in processed_combinations:
-                    continue
+    lines = shapely.linestrings([grid_lines[name] for name in names])
 
-                line1 = LineString(axis1_data)
-                line2 = LineString(axis2_data)
-                intersection = line1.intersection(line2)
+    # Bounding box candidates only, each unordered pair once in grid order.
+    axis1_ids, axis2_ids = STRtree(lines).query(lines)
+    pairs = axis1_ids < axis2_ids
+    order = np.lexsort((axis2_ids[pairs], axis1_ids[pairs]))
+    axis1_ids, axis2_ids = axis1_ids[pairs][order], axis2_ids[pairs][order]
 
-                if intersection.is_empty:
-                    continue
+    points = shapely.intersection(lines[axis1_ids], lines[axis2_ids])
+    is_point = shapely.get_type_id(points) == GeometryType.POINT
 
-                if intersection.geom_type == 'Point':
-                    intersections.append(((axis1_name, axis2_name), intersection))
-                    processed_combinations.add(combination1)
+    return [
+        ((names[axis1_id], names[axis2_id]), point)
+        for axis1_id, axis2_id, point in zip(axis1_ids[is_point], axis2_ids[is_point], points[is_point])
+    ]
 
-    return intersections
+
+def grid_topology(intersections: list) -> dict:
+    """
+    Map every axis to its direction and intersections sorted along it.
+    """
+    crossings = {}
+    for id_i, (names, _) in enumerate(intersections):
+        crossings.setdefault(names[0], []).append((names[1], id_i))
+        crossings.setdefault(names[1], []).append((names[0], id_i))
+
+    topology = {}
+    for axis, axis_crossings in crossings.items():
+        offsets = shapely.get_coordinates([intersections[id_i][1] for _, id_i in axis_crossings])
+        offsets -= offsets[0]
+        far = offsets[np.argmax(np.hypot(offsets[:, 0], offsets[:, 1]))]
+        length = np.hypot(*far)
+        direction = far / length if length else np.array([1.0, 0.0])
+        proj = offsets @ direction
+
+        order = np.argsort(proj, kind='stable')
+        axis_crossings = [axis_crossings[i] for i in order]
+        topology[axis] = {
+            'direction': direction,
+            'proj': proj[order].tolist(),
+            'crossings': axis_crossings,
+            'position': {id_i: pos for pos, (_, id_i) in enumerate(axis_crossings)},
+        }
+
+    return topology
+
+
+def convex_cells(topology: dict, points: np.ndarray) -> bool:
+    """
+    Whether every cell of the grid is convex.
+
+    Holds when all axes are straight and no two axes sharing two crossing
+    axes, the opposite sides of a cell, meet within the grid bounds: a folded
+    or self-intersecting cell always has two opposite sides meeting on it.
+    """
+    lines = {}
+    for axis, data in topology.items():
+        offsets = points[[id_i for _, id_i in data['crossings']]] - points[data['crossings'][0][1]]
+        normal = np.array([-data['direction'][1], data['direction'][0]])
+        if np.abs(offsets @ normal).max() > 1e-9 * max(np.abs(offsets).max(), 1):
+            return False
+        lines[axis] = (points[data['crossings'][0][1]], data['direction'], {name for name, _ in data['crossings']})
+
+    min_xy, max_xy = points.min(axis=0), points.max(axis=0)
+    axes = list(lines)
+    for id_a, a in enumerate(axes):
+        origin_a, direction_a, crossing_a = lines[a]
+        for c in axes[id_a + 1:]:
+            origin_c, direction_c, crossing_c = lines[c]
+            cross = np.cross(direction_a, direction_c)
+            if len(crossing_a & crossing_c) < 2 or not cross:
+                continue
+            meet = origin_a + direction_a * np.cross(origin_c - origin_a, direction_c) / cross
+            if (min_xy <= meet).all() and (meet <= max_xy).all():
+                return False
+    return True
 
 
 def line_area_recognition(intersections: list, unit: str):
     """
     Identify all axis and area zones.
+
+    Candidates are walked outward along each axis and the walk stops once the
+    zone can no longer fit under MAX_SIZE: the projected distance along an axis
+    never exceeds the real one, and a convex cell is never smaller than the
+    triangle spanned by its two sides at the first corner. Area walks are only
+    cut short when every cell of the grid is convex.
     """
+    if not intersections:
+        return [], []
+
+    max_length = MAX_SIZE * AREA_SIZE[unit]
+    max_area = max_length**2
+    topology = grid_topology(intersections)
+    pair_ids = {names: id_i for id_i, (names, _) in enumerate(intersections)}
+    points = shapely.get_coordinates([i[1] for i in intersections])
+    area_bound = max_area if convex_cells(topology, points) else np.inf
+
+    line_pairs = []
+    area_pairs = []
+
+    for axis in topology.values():
+        proj = axis['proj']
+        for pos1, (_, id_1) in enumerate(axis['crossings']):
+            for pos2 in range(pos1 + 1, len(proj)):
+                if proj[pos2] - proj[pos1] >= max_length:
+                    break
+                line_pairs.append(sorted((id_1, axis['crossings'][pos2][1])))
 
-    def has_common(i1, i2):
-        merged = i1 + i2
-        mergedset = set(merged)
-        if len(merged) != len(mergedset):
-            return True
-        return False
+    for id_i1, i1 in enumerate(intersections):
+        a, b = i1[0]
+        axis_a, axis_b = topology[a], topology[b]
+        pos_a, pos_b = axis_a['position'][id_i1], axis_b['position'][id_i1]
+        proj_a, proj_b = axis_a['proj'], axis_b['proj']
+        sin_ab = abs(np.cross(axis_a['direction'], axis_b['direction']))
+        nearest_b = min(abs(proj_b[pos] - proj_b[pos_b]) for pos in (pos_b - 1, pos_b + 1) if 0 <= pos < len(proj_b)) \
+            if len(proj_b) > 1 else 0
+
+        for step_a in (-1, 1):
+            for pos_d in range(pos_a + step_a, len(proj_a) if step_a > 0 else -1, step_a):
+                delta_a = abs(proj_a[pos_d] - proj_a[pos_a])
+                if delta_a * nearest_b * sin_ab / 2 >= area_bound:
+                    break
+                d, id_p2 = axis_a['crossings'][pos_d]
+
+                for step_b in (-1, 1):
+                    for pos_c in range(pos_b + step_b, len(proj_b) if step_b > 0 else -1, step_b):
+                        if delta_a * abs(proj_b[pos_c] - proj_b[pos_b]) * sin_ab / 2 >= area_bound:
+                            break
+                        c, id_p4 = axis_b['crossings'][pos_c]
+                        id_i2 = pair_ids.get((c, d))
+                        if id_i2 is not None and id_i2 > id_i1:
+                            area_pairs.append((id_i1, id_i2, id_p2, id_p4))
+
+    line_pairs = sorted(line_pairs)
+    area_pairs = sorted(area_pairs)
 
-    def find_third_point(name1, name2):
-        for i in intersections:
-            if (i[0][0] == name1 and i[0][1] == name2) or (i[0][0] == name2 and i[0][1] == name1):
-                return i
-        return False
-    
     line_zones = []
+    if line_pairs:
+        lines = shapely.linestrings(points[line_pairs])
+        for (id_i1, id_i2), line, length in zip(line_pairs, lines, shapely.length(lines)):
+            if length < max_length:
+                i1, i2 = intersections[id_i1], intersections[id_i2]
+                line_zones.append((
+                    f"{'-'.join(sorted(set((i1[0][0], i2[0][0]))))}/{'-'.join(sorted(set((i1[0][1], i2[0][1]))))}",
+                    line
+                    ))
+
     area_zones = []
+    if area_pairs:
+        # Corner order i1, p2, i2, p4 as in the pairwise definition.
+        polygons = shapely.polygons(points[np.array(area_pairs)[:, [0, 2, 1, 3]]])
+        for (id_i1, id_i2, _, _), polygon, area in zip(area_pairs, polygons, shapely.area(polygons)):
+            if area < max_area:
+                i1, i2 = intersections[id_i1], intersections[id_i2]
+                area_zones.append((
+                    f"{'-'.join(sorted((i1[0][0], i2[0][0])))}/{'-'.join(sorted((i1[0][1], i2[0][1])))}",
+                    polygon
+                    ))
 
-    for id_i1, i1 in enumerate(intersections):
-        for i2 in intersections[id_i1+1:]:
-            if has_common(i1[0], i2[0]):
-                line = LineString((i1[1], i2[1]))
-                if line.length < MAX_SIZE * AREA_SIZE[unit]:
-                    line_zones.append((
-                        f"{'-'.join(sorted(set((i1[0][0], i2[0][0]))))}/{'-'.join(sorted(set((i1[0][1], i2[0][1]))))}",
-                        line
-                        ))
-            else:
-                p2 = find_third_point(i1[0][0], i2[0][1])
-                p4 = find_third_point(i1[0][1], i2[0][0])
-                if p2 and p4:
-                    polygon = Polygon((i1[1], p2[1], i2[1], p4[1]))
-                    if polygon.area < (MAX_SIZE * AREA_SIZE[unit])**2:
-                        area_zones.append((
-                            f"{'-'.join(sorted((i1[0][0], i2[0][0])))}/{'-'.join(sorted((i1[0][1], i2[0][1])))}",
-                            polygon
-                            ))
     return line_zones, area_zones
 
 
-def zone_analyze(elements: list, zones: list, unit: str, building="", quad_segs=1):
-    elements_found = []
-    buffer_zones = []
-    for i in zones:
-        zone_name = i[0]
-        if isinstance(i[0], tuple):
-            zone_name = '/'.join(i[0])
-        area_shape = i[1].buffer(AREA_SIZE[unit], quad_segs)
-        buffer_zones.append((zone_name, area_shape, area_shape.area)) 
+class ZoneSet:
+    """
+    Buffered zones sorted by area, prepared and indexed for bulk predicates.
+
+    Cores keep the bounds of the unbuffered zones.
+    """
+
+    def __init__(self, zones: list, unit: str, quad_segs=1):
+        names = ['/'.join(i[0]) if isinstance(i[0], tuple) else i[0] for i in zones]
+        shapes = np.array([i[1] for i in zones], dtype=object)
+        cores = shapely.bounds(shapes).reshape(-1, 4)
+        if zones:
+            shapes = shapely.buffer(shapes, AREA_SIZE[unit], quad_segs=quad_segs)
+
+        order = np.argsort(shapely.area(shapes), kind='stable')
+        self.index([names[i] for i in order], shapes[order], cores[order])
+
+    @classmethod
+    def from_stored(cls, names: list, shapes: np.ndarray, cores: np.ndarray) -> 'ZoneSet':
+        """
+        Zone set of already buffered zones, stored in area order.
+        """
+        zone_set = cls.__new__(cls)
+        zone_set.index(names, shapes, cores.reshape(-1, 4))
+        return zone_set
+
+    def index(self, names: list, shapes: np.ndarray, cores: np.ndarray):
+        self.shapes = shapes
+        self.cores = cores
+        shapely.prepare(self.shapes)
+        self.areas = shapely.area(self.shapes)
+        self.bounds = shapely.bounds(self.shapes).reshape(-1, 4)
+        self.centroids = shapely.centroid(self.shapes)
+        self.zones = [(name, shape, area) for name, shape, area in zip(names, self.shapes, self.areas.tolist())]
+        self.tree = STRtree(self.shapes)
+
+    def __len__(self):
+        return len(self.zones)
+
+
+class CompiledGrid:
+    """
+    Zone sets of one building grid, each built on first use unless given.
+    """
 
-    buffer_zones.sort(key=lambda x: x[2])
+    def __init__(self, b_data: dict, unit: str, zone_sets: dict = None):
+        self.unit = unit
+        self.axis_intersections = intersection_recognition(b_data)
+        self.orthogonal = orthogonal_grid(b_data, self.axis_intersections, AREA_SIZE[unit]) if unit in AREA_SIZE else None
+        self._zones = dict(zone_sets or {})
+        self._lock = threading.Lock()
+
+    def zones(self, stage: str) -> ZoneSet:
+        with self._lock:
+            if stage not in self._zones:
+                if stage == 'point':
+                    self._zones['point'] = ZoneSet(self.axis_intersections, self.unit, quad_segs=3)
+                else:
+                    line_zones, area_zones = line_area_recognition(self.axis_intersections, self.unit)
+                    self._zones['line'] = ZoneSet(line_zones, self.unit)
+                    self._zones['area'] = ZoneSet(area_zones, self.unit)
+            return self._zones[stage]
+
+
+def zone_analyze(elements: ElementSet, zone_set: ZoneSet, building=""):
+    """
+    Locate the unresolved elements in the zones of one stage and mark them resolved.
 
-    for ele in elements:
+    Returns (element index, building, zone) of every element found.
+    """
+    elements_found = []
+    buffer_zones = zone_set.zones
+    pending = elements.pending()
+
+    if not len(pending) or not buffer_zones:
+        return elements_found
+
+    geometries = elements.geometries[pending]
+    cogs = elements.centroids[pending]
+    ele_areas = elements.areas[pending]
+
+    # Bounding box candidates, then the centroid test on the prepared zones.
+    ele_ids, zone_ids = zone_set.tree.query(cogs)
+    count('candidate_tests', len(zone_ids))
+    inside = shapely.contains_xy(zone_set.shapes[zone_ids], shapely.get_x(cogs)[ele_ids], shapely.get_y(cogs)[ele_ids])
+    ele_ids, zone_ids = ele_ids[inside], zone_ids[inside]
+
+    # A covering zone always passes the coverage band, a zone whose bounding
+    # box overlaps less than 99% of the element never does. Only the rest
+    # needs the exact intersection area.
+    covered = shapely.covers(zone_set.shapes[zone_ids], geometries[ele_ids])
+    ele_bounds = elements.bounds[pending[ele_ids]]
+    zone_bounds = zone_set.bounds[zone_ids]
+    overlap = np.clip(np.minimum(ele_bounds[:, 2], zone_bounds[:, 2]) - np.maximum(ele_bounds[:, 0], zone_bounds[:, 0]), 0, None) \
+        * np.clip(np.minimum(ele_bounds[:, 3], zone_bounds[:, 3]) - np.maximum(ele_bounds[:, 1], zone_bounds[:, 1]), 0, None)
+    possible = covered | (overlap >= ele_areas[ele_ids] * 0.99)
+
+    # Zone ids follow the area order of zone_set.zones.
+    order = np.lexsort((zone_ids, ele_ids))
+    candidates = [[] for _ in pending]
+    for ele_id, zone_id, zone_covered in zip(ele_ids[order][possible[order]].tolist(),
+                                             zone_ids[order][possible[order]].tolist(),
+                                             covered[order][possible[order]].tolist()):
+        candidates[ele_id].append((zone_id, zone_covered))
+
+    count('covered_tests', len(covered))
+    for id_e, geometry, ele_cog, ele1area, ele_candidates in zip(pending.tolist(), geometries, cogs, ele_areas.tolist(), candidates):
         ele_location = []
-        ele_cog = ele[1].centroid
         found_location = False
         smallest_area = -1
-        ele1area = ele[1].area
 
-        for i in buffer_zones:
-            if found_location and smallest_area != i[1].area:
+        for zone_id, zone_covered in ele_candidates:
+            i = buffer_zones[zone_id]
+            if found_location and smallest_area != i[2]:
                 break
 
-            if i[1].contains(ele_cog):
-                if ele1area * 0.99 <= ele[1].intersection(i[1]).area <= ele1area * 1.01:
-                    found_location = True
-                    smallest_area = i[1].area
-                    ele_location.append(i)
-
+            if zone_covered or ele1area * 0.99 <= geometry.intersection(i[1]).area <= ele1area * 1.01:
+                found_location = True
+                smallest_area = i[2]
+                ele_location.append(zone_id)
 
         if ele_location:
-            target_loc = ele_location[0]
-            target_area = ele_location[0][1].area
-            target_distance = (ele_location[0][1].centroid).distance(ele_cog)
-            for loc in ele_location:
-                loc_area = loc[1].area
-                loc_centroid = loc[1].centroid
+            target_loc = buffer_zones[ele_location[0]]
+            target_area = target_loc[2]
+            target_distance = zone_set.centroids[ele_location[0]].distance(ele_cog)
+            for zone_id in ele_location:
+                loc = buffer_zones[zone_id]
+                loc_area = loc[2]
+                loc_centroid = zone_set.centroids[zone_id]
                 if loc_area < target_area:
                     target_loc = loc
                     target_area = loc_area
@@ -219,9 +604,8 @@ def zone_analyze(elements: list, zones: list, unit: str, building="", quad_segs=
                         target_area = loc_area
                         target_distance = (loc_centroid).distance(ele_cog)
 
-            elements_found.append((ele, building, target_loc))
+            elements_found.append((id_e, building, target_loc))
 
-    for i in elements_found:
-        elements.remove(i[0])
+    elements.resolve([x[0] for x in elements_found])
 
-    return elements_found, elements
+    return elements_found
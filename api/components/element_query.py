@@ -0,0 +1,138 @@
+import numpy as np
+import shapely
+from django.db import connection
+from shapely import STRtree
+from api.components.instrumentation import count, stage
+from management.models import Element, Zone
+
+BOUNDS_FIELDS = ('min_x', 'min_y', 'max_x', 'max_y')
+
+# Window query on the R*Tree of element bounds, see migration 0007. The
+# exact bounds columns are checked as well since the tree stores floats.
+RTREE_QUERY = """
+    SELECT e.id, e.min_x, e.min_y, e.max_x, e.max_y
+    FROM management_element_rtree AS r CROSS JOIN management_element AS e ON e.id = r.id
+    WHERE r.min_x <= %s AND r.max_x >= %s AND r.min_y <= %s AND r.max_y >= %s AND r.project_id = %s
+      AND e.min_x <= %s AND e.max_x >= %s AND e.min_y <= %s AND e.max_y >= %s
+"""
+
+
+class RegionError(Exception):
+    """
+    Raised when a query region is missing or malformed.
+    """
+
+
+def point_bounds(element: Element):
+    """
+    Set the bounds of an element to its insertion point.
+    """
+    if element.coord_x is None or element.coord_y is None:
+        bounds = (None, None, None, None)
+    else:
+        bounds = (element.coord_x, element.coord_y, element.coord_x, element.coord_y)
+    for key, value in zip(BOUNDS_FIELDS, bounds):
+        setattr(element, key, value)
+
+
+def bounds_geometry(bounds: np.ndarray) -> np.ndarray:
+    """
+    Boxes of (min_x, min_y, max_x, max_y) rows, degenerate ones as points or segments.
+    """
+    min_x, min_y, max_x, max_y = bounds.T
+    geometries = shapely.box(min_x, min_y, max_x, max_y)
+    flat = (min_x == max_x) | (min_y == max_y)
+    if flat.any():
+        points = shapely.points(bounds[flat][:, :2])
+        lines = shapely.linestrings(np.stack((bounds[flat][:, :2], bounds[flat][:, 2:]), axis=1))
+        geometries[flat] = np.where((min_x == max_x)[flat] & (min_y == max_y)[flat], points, lines)
+    return geometries
+
+
+def query_regions(project, params: dict) -> tuple:
+    """
+    Return (regions, exact) of a zone name, bbox or polygon query.
+
+    Zones come from the stored project grid, Zone.DoesNotExist is raised
+    when no building has the named zone.
+
+    A bbox query is answered exactly by the bounds filter, zone and polygon
+    queries need the geometry refinement.
+    """
+    if params.get('zone'):
+        zones = Zone.objects.filter(building__project=project, name=params['zone'])
+        if params.get('building'):
+            zones = zones.filter(building__name=params['building'])
+        geometries = [bytes(x) for x in zones.values_list('geometry', flat=True)]
+        if not geometries:
+            raise Zone.DoesNotExist(f"Zone {params['zone']} does not exist")
+        return shapely.from_wkb(np.array(geometries, dtype=object)), False
+
+    if params.get('bbox') is not None:
+        bbox = params['bbox']
+        try:
+            bbox = [float(x) for x in (bbox.split(',') if isinstance(bbox, str) else bbox)]
+        except (TypeError, ValueError):
+            raise RegionError('bbox must contain numbers')
+        if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            raise RegionError('bbox must be min_x, min_y, max_x, max_y')
+        return np.array([shapely.box(*bbox)]), True
+
+    if params.get('polygon') is not None:
+        try:
+            polygon = shapely.polygons([vertex[:2] for vertex in params['polygon']])
+        except (TypeError, ValueError, IndexError, shapely.errors.GEOSException):
+            raise RegionError('polygon must contain at least 3 [x, y] vertices')
+        if not polygon.is_valid:
+            raise RegionError('polygon is not valid')
+        return np.array([polygon]), False
+
+    raise RegionError('Query must contain a zone, bbox or polygon')
+
+
+def bounds_candidates(project, min_x: float, min_y: float, max_x: float, max_y: float) -> list:
+    """
+    Return (id, min_x, min_y, max_x, max_y) of the project elements whose bounds intersect the window.
+
+    SQLite answers through the R*Tree of element bounds, so the cost follows
+    the elements of all projects near the window rather than the project
+    size. Other databases filter the bounds columns.
+    """
+    if connection.vendor == 'sqlite':
+        window = [max_x, min_x, max_y, min_y]
+        with connection.cursor() as cursor:
+            cursor.execute(RTREE_QUERY, [*window, project.id, *window])
+            return cursor.fetchall()
+    return list(Element.objects.filter(project=project, min_x__lte=max_x, max_x__gte=min_x, min_y__lte=max_y,
+                                       max_y__gte=min_y).values_list('id', *BOUNDS_FIELDS))
+
+
+def elements_within(project, regions: np.ndarray, exact=False, batch_size=500) -> list:
+    """
+    Return the stored project elements whose bounds intersect any of the regions.
+
+    Candidates come from the indexed element bounds, only their ids and
+    bounds are loaded. Unless the bounds filter is exact they are refined
+    against the regions through an STRtree, then fetched in id order.
+    """
+    min_x, min_y, max_x, max_y = shapely.total_bounds(regions).tolist()
+    with stage('db_candidates'):
+        candidates = bounds_candidates(project, min_x, min_y, max_x, max_y)
+    count('candidates', len(candidates))
+    if not candidates:
+        return []
+
+    columns = np.array(candidates, dtype=float)
+    ids = columns[:, 0].astype(np.int64)
+    if not exact:
+        with stage('refine'):
+            shapely.prepare(regions)
+            _, element_ids = STRtree(bounds_geometry(columns[:, 1:])).query(regions, predicate='intersects')
+            ids = ids[np.unique(element_ids)]
+    ids = np.sort(ids).tolist()
+
+    elements = []
+    with stage('db_fetch'):
+        for id_e in range(0, len(ids), batch_size):
+            elements += Element.objects.filter(id__in=ids[id_e:id_e + batch_size]).order_by('id')
+    return elements
@@ -0,0 +1,78 @@
+from datetime import date
+import time
+
+from django.core.cache import cache as default_cache
+from django.db.models import Count, F, Q
+from api.components.instrumentation import count, stage
+from management.models import Element
+
+STATUS_FIELDS = ('production_status', 'transport_status', 'assembly_status')
+
+
+def version_key(project) -> str:
+    return f'element_status_version:{project.id}'
+
+
+def status_version(project, cache=default_cache) -> int:
+    """
+    Current status version of a project.
+
+    A missing version starts from the clock rather than 1, so entries of
+    an evicted version can never be served again.
+    """
+    return cache.get_or_set(version_key(project), time.time_ns, None)
+
+
+def invalidate_status(project, cache=default_cache):
+    """
+    Move a project to a new status version after its elements changed.
+    """
+    try:
+        cache.incr(version_key(project))
+    except ValueError:
+        pass
+
+
+def status_counts(project) -> dict:
+    """
+    Element counts by status and by planned against actual assembly date.
+
+    One GROUP BY over all status columns and one conditional aggregate over
+    the dates, both computed by the database.
+    """
+    statuses = {name: {} for name in STATUS_FIELDS}
+    for row in Element.objects.filter(project=project).values(*STATUS_FIELDS).annotate(count=Count('id')).order_by():
+        for name in STATUS_FIELDS:
+            statuses[name][row[name]] = statuses[name].get(row[name], 0) + row['count']
+
+    today = date.today()
+    assembly = Element.objects.filter(project=project).aggregate(
+        total=Count('id'),
+        planned=Count('id', filter=Q(planned_assembly_date__isnull=False)),
+        assembled=Count('id', filter=Q(assembly_date__isnull=False)),
+        on_time=Count('id', filter=Q(assembly_date__lte=F('planned_assembly_date'))),
+        late=Count('id', filter=Q(assembly_date__gt=F('planned_assembly_date'))),
+        unplanned=Count('id', filter=Q(assembly_date__isnull=False, planned_assembly_date__isnull=True)),
+        overdue=Count('id', filter=Q(assembly_date__isnull=True, planned_assembly_date__lt=today)),
+    )
+
+    return {
+        'date': today.isoformat(),
+        **{name: [{'value': value, 'count': x} for value, x in sorted(counts.items(), key=lambda x: (x[0] is None, x[0] or ''))]
+           for name, counts in statuses.items()},
+        'assembly': assembly,
+    }
+
+
+def status_summary(project, cache=default_cache, timeout=None) -> dict:
+    """
+    Cached status_counts of a project, keyed by its status version and the day.
+    """
+    key = f'element_status:{project.id}:{status_version(project, cache)}:{date.today().isoformat()}'
+    summary = cache.get(key)
+    count('status_cache_hit', int(summary is not None))
+    if summary is None:
+        with stage('db_aggregate'):
+            summary = status_counts(project)
+        cache.set(key, summary, timeout)
+    return summary
@@ -0,0 +1,151 @@
+import numpy as np
+import shapely
+from django.db import transaction
+from api.components.element_location import AREA_SIZE, STAGES, CompiledGrid, ZoneSet, unit_recognition, zone_cache
+from api.components.instrumentation import stage
+from api.components.zone_cache import grid_key, grids_etag, ZoneCache
+from management.models import Building, GridLine, Zone
+
+ZONE_COLUMNS = ('stage', 'name', 'geometry', 'core_min_x', 'core_min_y', 'core_max_x', 'core_max_y')
+
+
+class GridMismatch(Exception):
+    """
+    Raised when a request references another revision than the stored grid.
+    """
+
+
+def project_etag(buildings) -> str:
+    """
+    Hash of the stored building grids of a project, equal to the hash of the same grid sent inline.
+    """
+    return grids_etag([(building.name, building.etag) for building in buildings])
+
+
+def zone_rows(building: Building, grid: CompiledGrid) -> list:
+    """
+    Zone rows of every stage of a compiled grid, geometry as WKB in area order.
+    """
+    rows = []
+    for stage_name in STAGES:
+        zone_set = grid.zones(stage_name)
+        geometries = shapely.to_wkb(zone_set.shapes) if len(zone_set) else []
+        for position, (zone, geometry, bounds, core) in enumerate(zip(zone_set.zones, geometries, zone_set.bounds.tolist(),
+                                                                      zone_set.cores.tolist())):
+            rows.append(Zone(
+                building=building, stage=stage_name, position=position, name=zone[0], area=zone[2], geometry=geometry,
+                min_x=bounds[0], min_y=bounds[1], max_x=bounds[2], max_y=bounds[3],
+                core_min_x=core[0], core_min_y=core[1], core_max_x=core[2], core_max_y=core[3],
+            ))
+    return rows
+
+
+def save_grid(project, buildings: dict, batch_size: int, cache: ZoneCache = zone_cache) -> dict:
+    """
+    Replace the stored grid of a project.
+
+    Buildings whose grid is unchanged keep their zones, changed ones are
+    compiled once and their zones stored. The project grid version is bumped
+    whenever the result of a location could change.
+    """
+    unit = unit_recognition({'buildings': buildings})
+    if unit not in AREA_SIZE:
+        raise ValueError('Grid unit could not be recognized')
+
+    existing = {building.name: building for building in project.buildings.all()}
+    previous = project_etag(existing.values())
+    changed = []
+    with transaction.atomic():
+        removed = [b_name for b_name in existing if b_name not in buildings]
+        Building.objects.filter(project=project, name__in=removed).delete()
+
+        stored = []
+        for position, (b_name, b_data) in enumerate(buildings.items()):
+            etag = grid_key(b_data, unit)
+            building = existing.get(b_name)
+            if building is not None and building.etag == etag:
+                if building.position != position:
+                    building.position = position
+                    building.save(update_fields=['position'])
+                stored.append(building)
+                continue
+
+            if building is None:
+                building = Building(project=project, name=b_name, version=0)
+            building.position, building.unit, building.etag = position, unit, etag
+            building.version += 1
+            building.save()
+            building.grid_lines.all().delete()
+            building.zones.all().delete()
+
+            GridLine.objects.bulk_create([
+                GridLine(building=building, name=name, position=id_g, vertices=axis)
+                for id_g, (name, axis) in enumerate(b_data['grid_lines'].items())
+            ], batch_size=batch_size)
+            with stage('grid'):
+                grid = cache.get(etag, lambda: CompiledGrid(b_data, unit))
+            with stage('db_write'):
+                Zone.objects.bulk_create(zone_rows(building, grid), batch_size=batch_size)
+            changed.append(b_name)
+            stored.append(building)
+
+        etag = project_etag(stored)
+        if etag != previous or not project.grid_version:
+            project.grid_version += 1
+            project.save(update_fields=['grid_version'])
+
+    return {'grid_version': project.grid_version, 'grid_etag': etag, 'changed': changed, 'removed': removed}
+
+
+def stored_grid(building: Building, b_data: dict) -> CompiledGrid:
+    """
+    Compiled grid of a stored building with the zone sets restored from WKB.
+    """
+    zones = {stage_name: ([], [], []) for stage_name in STAGES}
+    for stage_name, name, geometry, *core in Zone.objects.filter(building=building).order_by('stage', 'position') \
+            .values_list(*ZONE_COLUMNS):
+        names, geometries, cores = zones[stage_name]
+        names.append(name)
+        geometries.append(bytes(geometry))
+        cores.append(core)
+
+    zone_sets = {
+        stage_name: ZoneSet.from_stored(names, shapely.from_wkb(np.array(geometries, dtype=object)),
+                                        np.array(cores, dtype=float))
+        for stage_name, (names, geometries, cores) in zones.items()
+    }
+    return CompiledGrid(b_data, building.unit, zone_sets)
+
+
+def building_data(building: Building) -> dict:
+    return {'grid_lines': {line.name: line.vertices for line in building.grid_lines.all()}}
+
+
+def project_grid(project) -> dict:
+    """
+    Return the stored buildings of a project as a location request grid.
+    """
+    return {building.name: building_data(building) for building in project.buildings.prefetch_related('grid_lines')}
+
+
+def load_grid(project, grid_version=None, grid_etag=None, cache: ZoneCache = zone_cache) -> dict:
+    """
+    Return the stored grid of a project and put its compiled buildings in the zone cache.
+
+    A given grid version or etag has to match the stored one, else
+    GridMismatch is raised.
+    """
+    buildings = list(project.buildings.prefetch_related('grid_lines'))
+    etag = project_etag(buildings)
+    if grid_version is not None and grid_version != project.grid_version:
+        raise GridMismatch(f'Stored grid version is {project.grid_version}, not {grid_version}')
+    if grid_etag is not None and grid_etag != etag:
+        raise GridMismatch('Stored grid etag does not match')
+
+    grid = {}
+    for building in buildings:
+        b_data = building_data(building)
+        with stage('grid'):
+            cache.get(building.etag, lambda: stored_grid(building, b_data))
+        grid[building.name] = b_data
+    return grid
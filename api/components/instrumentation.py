@@ -0,0 +1,112 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import threading
+import time
+
+_current = ContextVar('request_metrics', default=None)
+_disabled = nullcontext()
+
+
+class RequestMetrics:
+    """
+    Stage durations and counters collected during one request.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start_time
+            with self._lock:
+                self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def count(self, name: str, value: int):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def server_timing(self) -> str:
+        """
+        Value of the Server-Timing header, durations in milliseconds.
+        """
+        entries = [f'{name};dur={duration * 1000:.2f}' for name, duration in self.durations.items()]
+        entries += [f'{name};desc="{value}"' for name, value in self.counts.items()]
+        return ', '.join(entries)
+
+
+class MetricsRegistry:
+    """
+    In-process aggregate of all collected request metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.requests = 0
+            self.stages = {}
+            self.counts = {}
+
+    def record(self, metrics: RequestMetrics):
+        with self._lock:
+            self.requests += 1
+            for name, duration in metrics.durations.items():
+                stage = self.stages.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+                stage['count'] += 1
+                stage['total'] += duration
+                stage['max'] = max(stage['max'], duration)
+            for name, value in metrics.counts.items():
+                self.counts[name] = self.counts.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'stages': {name: {
+                    'count': x['count'],
+                    'total_ms': x['total'] * 1000,
+                    'mean_ms': x['total'] / x['count'] * 1000,
+                    'max_ms': x['max'] * 1000,
+                } for name, x in self.stages.items()},
+                'counts': dict(self.counts),
+            }
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def collect():
+    """
+    Collect metrics of everything run in the current context inside the block.
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def stage(name: str):
+    """
+    Time a block as a stage of the current request, a shared no-op when not collecting.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return _disabled
+    return metrics.stage(name)
+
+
+def count(name: str, value: int):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, value)
@@ -0,0 +1,117 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import cache, partial
+import multiprocessing
+import threading
+
+import django
+from django.db import close_old_connections
+from django.utils import timezone
+from api.components.element_location import STAGES, process_stream
+from api.components.instrumentation import collect
+from management.models import Job
+
+
+def job_progress(total: int, processed: int, counts: dict) -> dict:
+    """
+    Elements processed so far and located by each stage.
+    """
+    located = {stage: counts.get(f'{stage}_located', 0) for stage in STAGES}
+    return {'elements': total, 'processed': processed, **located, 'not_found': processed - sum(located.values())}
+
+
+def run_location_job(job_id, chunk_size: int):
+    """
+    Run a queued location job chunk by chunk, storing its progress after every chunk.
+
+    The job is claimed by moving it from queued to running, so a job
+    submitted twice only runs once.
+    """
+    close_old_connections()
+    if not Job.objects.filter(id=job_id, status=Job.QUEUED).update(status=Job.RUNNING, started_at=timezone.now()):
+        return
+
+    try:
+        payload = Job.objects.values_list('payload', flat=True).get(id=job_id)
+        elements = payload['elements']
+        rows = []
+        with collect() as metrics:
+            for chunk in process_stream({'buildings': payload['buildings']}, elements, chunk_size):
+                rows += [[x[0][0], x[1], x[2][0]] for x in chunk]
+                Job.objects.filter(id=job_id).update(progress=job_progress(len(elements), len(rows), metrics.counts))
+        Job.objects.filter(id=job_id).update(status=Job.DONE, result={'elements': rows}, finished_at=timezone.now())
+    except Exception as e:
+        Job.objects.filter(id=job_id).update(status=Job.FAILED, error=f'{type(e).__name__}: {e}', finished_at=timezone.now())
+
+
+@cache
+def job_executor(workers: int, chunk_size: int) -> ProcessPoolExecutor:
+    """
+    Shared pool of spawned worker processes for location jobs.
+
+    Jobs still running when the pool is created lost their worker, with a
+    previous server process or a broken pool, and are marked failed. Jobs
+    still queued are resubmitted.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=django.setup)
+    Job.objects.filter(status=Job.RUNNING).update(status=Job.FAILED, error='Worker process stopped before the job finished',
+                                                  finished_at=timezone.now())
+    for job_id in Job.objects.filter(status=Job.QUEUED).order_by('created_at').values_list('id', flat=True):
+        submit_job(executor, job_id, workers, chunk_size)
+    return executor
+
+
+_replace_lock = threading.Lock()
+
+
+def replace_executor(broken: ProcessPoolExecutor, workers: int, chunk_size: int) -> ProcessPoolExecutor:
+    """
+    Replace the shared pool once it is broken, return the current pool.
+    """
+    with _replace_lock:
+        if job_executor(workers, chunk_size) is broken:
+            job_executor.cache_clear()
+            broken.shutdown(wait=False, cancel_futures=True)
+        return job_executor(workers, chunk_size)
+
+
+def job_finished(job_id, executor: ProcessPoolExecutor, workers: int, chunk_size: int, future):
+    """
+    Fail a job whose worker process died and replace the broken pool.
+
+    run_location_job stores its own errors, a job future only fails when
+    its worker process stopped.
+    """
+    error = None if future.cancelled() else future.exception()
+    if error is None:
+        return
+    Job.objects.filter(id=job_id, status=Job.RUNNING).update(status=Job.FAILED, error=f'{type(error).__name__}: {error}',
+                                                             finished_at=timezone.now())
+    if isinstance(error, BrokenProcessPool):
+        replace_executor(executor, workers, chunk_size)
+
+
+def submit_job(executor: ProcessPoolExecutor, job_id, workers: int, chunk_size: int):
+    future = executor.submit(run_location_job, job_id, chunk_size)
+    future.add_done_callback(partial(job_finished, job_id, executor, workers, chunk_size))
+
+
+def submit_location_job(payload: dict, workers: int, chunk_size: int) -> Job:
+    """
+    Store a location request as a queued job and hand it to the worker pool.
+
+    A broken pool is replaced before the job is submitted again, a job that
+    cannot be submitted is marked failed.
+    """
+    executor = job_executor(workers, chunk_size)
+    job = Job.objects.create(payload=payload)
+    try:
+        try:
+            submit_job(executor, job.id, workers, chunk_size)
+        except BrokenProcessPool:
+            submit_job(replace_executor(executor, workers, chunk_size), job.id, workers, chunk_size)
+    except Exception as e:
+        Job.objects.filter(id=job.id).update(status=Job.FAILED, error=f'{type(e).__name__}: {e}', finished_at=timezone.now())
+        raise
+    return job
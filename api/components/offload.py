@@ -0,0 +1,74 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import cache, partial
+import asyncio
+import multiprocessing
+import threading
+
+import django
+
+
+class Saturated(Exception):
+    """
+    Raised when a bounded executor already runs its maximum number of jobs.
+    """
+
+
+class BoundedExecutor:
+    """
+    Executor wrapper that rejects work beyond max_in_flight instead of queueing it.
+
+    With a factory, a process pool broken by a dead worker is replaced by a
+    new one on the next submit.
+    """
+
+    def __init__(self, executor: Executor, max_in_flight: int, factory=None):
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.factory = factory
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise Saturated(f'{self.max_in_flight} jobs already in flight')
+        try:
+            future = self._submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _submit(self, fn, *args, **kwargs) -> Future:
+        executor = self.executor
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            if self.factory is None:
+                raise
+        with self._lock:
+            if self.executor is executor:
+                self.executor = self.factory()
+                executor.shutdown(wait=False, cancel_futures=True)
+        return self.executor.submit(fn, *args, **kwargs)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn in the pool and wait for it without blocking the event loop.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+
+@cache
+def bounded_executor(workers: int, max_in_flight: int, kind='process') -> BoundedExecutor:
+    """
+    Shared bounded pool for CPU heavy work of async views.
+
+    Worker processes are spawned rather than forked from the threaded server.
+    """
+    if kind == 'process':
+        factory = partial(ProcessPoolExecutor, max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                          initializer=django.setup)
+        return BoundedExecutor(factory(), max_in_flight, factory)
+    return BoundedExecutor(ThreadPoolExecutor(max_workers=workers, thread_name_prefix='offload'), max_in_flight)
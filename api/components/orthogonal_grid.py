@@ -0,0 +1,266 @@
+import numpy as np
+import shapely
+
+# Point zones are 12-gons (quad_segs=3), only their inscribed circle is used
+# to prove an element covered.
+POINT_INRADIUS = np.cos(np.pi / 12)
+# Relative margin kept around every decision, closer elements go to Shapely.
+TOLERANCE = 1e-6
+NONE = -1
+UNDECIDED = -2
+
+
+def orthogonal_grid(b_data: dict, intersections: list, distance: float):
+    """
+    Return an OrthogonalGrid when all axes are vertical or horizontal lines.
+
+    Grids with skewed, repeated or closer than two zone distances axes return
+    None and are located by Shapely only.
+    """
+    columns, rows = {}, {}
+    for name, axis in b_data['grid_lines'].items():
+        axis_x = {float(x) for x, _ in axis}
+        axis_y = {float(y) for _, y in axis}
+        if len(axis_x) == 1 and len(axis_y) > 1:
+            columns[name] = axis_x.pop()
+        elif len(axis_y) == 1 and len(axis_x) > 1:
+            rows[name] = axis_y.pop()
+        else:
+            return None
+
+    xs, ys = sorted(columns.values()), sorted(rows.values())
+    if not intersections or len(set(xs)) < len(xs) or len(set(ys)) < len(ys):
+        return None
+    if min(np.diff(xs), default=np.inf) <= 2 * distance * (1 + TOLERANCE) or \
+            min(np.diff(ys), default=np.inf) <= 2 * distance * (1 + TOLERANCE):
+        return None
+
+    x_ids = {x: id_x for id_x, x in enumerate(xs)}
+    y_ids = {y: id_y for id_y, y in enumerate(ys)}
+    crossing = np.zeros((len(xs), len(ys)), dtype=bool)
+    for (a, b), point in intersections:
+        if a in columns and b in rows:
+            x, y = columns[a], rows[b]
+        elif b in columns and a in rows:
+            x, y = columns[b], rows[a]
+        else:
+            return None
+        if (point.x, point.y) != (x, y):
+            return None
+        crossing[x_ids[x], y_ids[y]] = True
+
+    return OrthogonalGrid(np.array(xs), np.array(ys), crossing, distance)
+
+
+def nearest(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """
+    Index of the nearest sorted value for every x.
+    """
+    right = np.clip(np.searchsorted(values, x), 1, len(values) - 1) if len(values) > 1 else np.zeros(len(x), dtype=int)
+    left = np.maximum(right - 1, 0)
+    return np.where(np.abs(x - values[left]) <= np.abs(values[right] - x), left, right)
+
+
+def overlap(bounds: np.ndarray, x0, y0, x1, y1) -> np.ndarray:
+    """
+    Area of the bounds clipped to a box, an upper bound of any intersection inside it.
+    """
+    width = np.minimum(bounds[:, 2], x1) - np.maximum(bounds[:, 0], x0)
+    height = np.minimum(bounds[:, 3], y1) - np.maximum(bounds[:, 1], y0)
+    return np.clip(width, 0, None) * np.clip(height, 0, None)
+
+
+class ElementBatch:
+    """
+    Vertex, centroid and bound columns of the elements located together.
+    """
+
+    def __init__(self, elements, pending: np.ndarray):
+        self.vertices, self.owner = shapely.get_coordinates(elements.geometries[pending], return_index=True)
+        self.starts = np.flatnonzero(np.r_[True, self.owner[1:] != self.owner[:-1]])
+        self.centroids = shapely.get_coordinates(elements.centroids[pending])
+        self.bounds = elements.bounds[pending]
+        self.threshold = elements.areas[pending] * (0.99 - TOLERANCE)
+
+
+class OrthogonalGrid:
+    """
+    Zone arithmetic of a grid made of vertical and horizontal axes.
+
+    Zones are the intersections, axis segments and cells buffered by the zone
+    distance, so coverage reduces to distances to sorted axis coordinates. An
+    element is located here only when its zone is certain: it is covered by
+    the smallest zone with margin and every smaller zone keeps less than the
+    coverage band of it. Everything else stays for zone_analyze.
+    """
+
+    def __init__(self, xs: np.ndarray, ys: np.ndarray, crossing: np.ndarray, distance: float):
+        self.xs = xs
+        self.ys = ys
+        self.crossing = crossing
+        self.distance = distance
+        self.column_ys = [ys[crossing[id_x]] for id_x in range(len(xs))]
+        self.row_xs = [xs[crossing[:, id_y]] for id_y in range(len(ys))]
+        self._lookups = {}
+
+    def zone_lookup(self, zones, stage: str):
+        """
+        Zone set of a stage with the index of the first zone of every core geometry.
+        """
+        if stage not in self._lookups:
+            zone_set = zones(stage)
+            lookup = {}
+            for id_z, core in enumerate(map(tuple, zone_set.cores.tolist())):
+                lookup.setdefault(core, id_z)
+            self._lookups[stage] = (zone_set, lookup, shapely.get_coordinates(zone_set.centroids))
+        return self._lookups[stage]
+
+    def locate(self, elements, zones) -> list:
+        """
+        Locate the unresolved elements whose zone needs no geometry test and mark them resolved.
+
+        Returns (element index, zone) pairs of the point, line and area stages.
+        """
+        located = [[], [], []]
+        pending = elements.pending()
+        if not len(pending):
+            return located
+        batch = ElementBatch(elements, pending)
+        if len(batch.starts) != len(pending):
+            # Empty geometries have no vertices to reason about.
+            return located
+
+        # Undecided elements stop here, the later stages only take the
+        # elements proven outside every zone of the earlier ones.
+        stages = [('point', self.point_zones(zones, batch))]
+        resolved = stages[0][1] != NONE
+        if not resolved.all():
+            stages.append(('line', self.line_zones(zones, batch)))
+            stages[1][1][resolved] = NONE
+            resolved |= stages[1][1] != NONE
+        if not resolved.all():
+            stages.append(('area', self.area_zones(zones, batch)))
+            stages[2][1][resolved] = NONE
+
+        for located_stage, (stage_name, zone_ids) in zip(located, stages):
+            zone_set = self.zone_lookup(zones, stage_name)[0]
+            found = np.flatnonzero(zone_ids >= 0)
+            located_stage += [(id_e, zone_set.zones[id_z]) for id_e, id_z in zip(pending[found].tolist(), zone_ids[found].tolist())]
+            elements.resolve(pending[found])
+
+        return located
+
+    def point_zones(self, zones, batch: ElementBatch) -> np.ndarray:
+        zone_set, lookup, _ = self.zone_lookup(zones, 'point')
+        d = self.distance
+        eps = d * TOLERANCE
+        cx, cy = batch.centroids.T
+        id_x, id_y = nearest(self.xs, cx), nearest(self.ys, cy)
+        px, py = self.xs[id_x], self.ys[id_y]
+
+        vx, vy = batch.vertices.T
+        reach = np.maximum.reduceat(np.hypot(vx - px[batch.owner], vy - py[batch.owner]), batch.starts)
+        exists = self.crossing[id_x, id_y]
+        outside = ~exists | (np.hypot(cx - px, cy - py) > d + eps) | (overlap(batch.bounds, px - d, py - d, px + d, py + d) < batch.threshold)
+
+        result = np.where(outside, NONE, UNDECIDED)
+        covered = np.flatnonzero(exists & (reach <= d * POINT_INRADIUS - eps))
+        result[covered] = [lookup.get((x, y, x, y), UNDECIDED) for x, y in zip(px[covered].tolist(), py[covered].tolist())]
+        return result
+
+    def line_zones(self, zones, batch: ElementBatch) -> np.ndarray:
+        zone_set, _, centroids = self.zone_lookup(zones, 'line')
+        vertical = self.axis_zones(zones, batch, True)
+        horizontal = self.axis_zones(zones, batch, False)
+
+        result = np.where((vertical == UNDECIDED) | (horizontal == UNDECIDED), UNDECIDED, np.maximum(vertical, horizontal))
+        # An element covered along both axes takes the smaller zone, the
+        # closer one on equal areas like zone_analyze.
+        both = np.flatnonzero((vertical >= 0) & (horizontal >= 0))
+        first, second = np.minimum(vertical[both], horizontal[both]), np.maximum(vertical[both], horizontal[both])
+        cogs = batch.centroids[both]
+        distance1 = np.sqrt(((centroids[first] - cogs)**2).sum(axis=1))
+        distance2 = np.sqrt(((centroids[second] - cogs)**2).sum(axis=1))
+        result[both] = np.where((zone_set.areas[first] == zone_set.areas[second]) & (distance2 < distance1), second, first)
+        return result
+
+    def axis_zones(self, zones, batch: ElementBatch, vertical: bool) -> np.ndarray:
+        """
+        Smallest line zone along the vertical or horizontal axis next to each element.
+        """
+        lookup = self.zone_lookup(zones, 'line')[1]
+        d = self.distance
+        eps = d * TOLERANCE
+        if vertical:
+            axes, lines, across, bounds = self.xs, self.column_ys, 0, batch.bounds
+        else:
+            axes, lines, across, bounds = self.ys, self.row_xs, 1, batch.bounds[:, [1, 0, 3, 2]]
+        c_across = batch.centroids[:, across]
+        v_across, v_along = batch.vertices[:, across], batch.vertices[:, 1 - across]
+
+        id_a = nearest(axes, c_across)
+        a = axes[id_a]
+        offset = np.abs(v_across - a[batch.owner])
+        coverable = np.maximum.reduceat(offset, batch.starts) <= d - eps
+        upper = np.minimum.reduceat(v_along + (d - eps) - offset, batch.starts)
+        lower = np.maximum.reduceat(v_along - (d - eps) + offset, batch.starts)
+
+        candidate = (np.abs(c_across - a) <= d + eps) & (overlap(bounds, a - d, -np.inf, a + d, np.inf) >= batch.threshold)
+        result = np.where(candidate, UNDECIDED, NONE)
+        for axis in np.unique(id_a[candidate & coverable]).tolist():
+            ids = np.flatnonzero(candidate & coverable & (id_a == axis))
+            line = lines[axis]
+            x = axes[axis]
+            if not len(line):
+                result[ids] = NONE
+                continue
+
+            # Segments not covering the element start above its lowest or end
+            # below its highest reach and keep at most this much of it.
+            start = np.searchsorted(line, upper[ids], 'right') - 1
+            end = np.searchsorted(line, lower[ids], 'left')
+            low = np.where(start + 1 < len(line), line[np.minimum(start + 1, len(line) - 1)] - d, np.inf)
+            high = np.where(end > 0, line[np.maximum(end - 1, 0)] + d, -np.inf)
+            partial = np.maximum(overlap(bounds[ids], x - d, low, x + d, np.inf), overlap(bounds[ids], x - d, -np.inf, x + d, high))
+            decided = partial < batch.threshold[ids]
+
+            result[ids[decided & ((start < 0) | (end >= len(line)))]] = NONE
+            single = decided & (start >= 0) & (end < len(line)) & (end > start)
+            for id_e, y1, y2 in zip(ids[single].tolist(), line[start[single]].tolist(), line[end[single]].tolist()):
+                result[id_e] = lookup.get((x, y1, x, y2) if vertical else (y1, x, y2, x), UNDECIDED)
+        return result
+
+    def area_zones(self, zones, batch: ElementBatch) -> np.ndarray:
+        lookup = self.zone_lookup(zones, 'area')[1]
+        d = self.distance
+        eps = d * TOLERANCE
+        xs, ys = self.xs, self.ys
+        minx, miny, maxx, maxy = batch.bounds.T
+
+        # Tightest cell reaching every side of the element.
+        id_x1 = np.searchsorted(xs, minx + d - eps, 'right') - 1
+        id_x2 = np.searchsorted(xs, maxx - d + eps, 'left')
+        id_y1 = np.searchsorted(ys, miny + d - eps, 'right') - 1
+        id_y2 = np.searchsorted(ys, maxy - d + eps, 'left')
+        valid = (id_x1 >= 0) & (id_x2 < len(xs)) & (id_x1 < id_x2) & (id_y1 >= 0) & (id_y2 < len(ys)) & (id_y1 < id_y2)
+        id_x1, id_x2 = np.where(valid, id_x1, 0), np.where(valid, id_x2, 1 % len(xs))
+        id_y1, id_y2 = np.where(valid, id_y1, 0), np.where(valid, id_y2, 1 % len(ys))
+        x1, x2, y1, y2 = xs[id_x1], xs[id_x2], ys[id_y1], ys[id_y2]
+
+        vx, vy = batch.vertices.T
+        dx = np.maximum(np.maximum(x1[batch.owner] - vx, vx - x2[batch.owner]), 0)
+        dy = np.maximum(np.maximum(y1[batch.owner] - vy, vy - y2[batch.owner]), 0)
+        covered = np.maximum.reduceat(dx + dy, batch.starts) <= d - eps
+
+        # Any other cell misses one side of the tightest one.
+        partial = np.maximum.reduce([
+            overlap(batch.bounds, xs[np.minimum(id_x1 + 1, len(xs) - 1)] - d, -np.inf, np.inf, np.inf),
+            overlap(batch.bounds, -np.inf, -np.inf, xs[np.maximum(id_x2 - 1, 0)] + d, np.inf),
+            overlap(batch.bounds, -np.inf, ys[np.minimum(id_y1 + 1, len(ys) - 1)] - d, np.inf, np.inf),
+            overlap(batch.bounds, -np.inf, -np.inf, np.inf, ys[np.maximum(id_y2 - 1, 0)] + d),
+        ])
+
+        result = np.full(len(batch.bounds), UNDECIDED)
+        cells = np.flatnonzero(valid & covered & (partial < batch.threshold))
+        result[cells] = [lookup.get(key, UNDECIDED) for key in zip(x1[cells].tolist(), y1[cells].tolist(), x2[cells].tolist(), y2[cells].tolist())]
+        return result
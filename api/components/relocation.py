@@ -0,0 +1,110 @@
+from collections import Counter
+import hashlib
+import json
+
+from django.db import transaction
+from api.components.element_instance import element_identity
+from api.components.element_location import process_data, unit_recognition, zone_cache
+from api.components.element_query import BOUNDS_FIELDS
+from api.components.zone_cache import grid_key, grids_etag
+from management.models import Element
+
+GEOMETRY_KEYS = ('coords', 'rotation', 'size', 'boundary')
+
+
+def grids_key(data: dict) -> str:
+    """
+    Hash of all building grids of a request, in building order.
+    """
+    unit = unit_recognition(data)
+    return grids_etag([(b_name, grid_key(b_data, unit)) for b_name, b_data in data['buildings'].items()])
+
+
+def element_signature(element_data: dict) -> str:
+    """
+    Hash of the element values the location depends on.
+    """
+    payload = json.dumps({x: element_data[x] for x in GEOMETRY_KEYS if x in element_data}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def location_identity(element_data: dict) -> tuple:
+    """
+    Element identity of a location request entry, from its name, insertion point and rotation.
+    """
+    coords = list(element_data.get('coords') or [])[:3]
+    rotation = list(element_data.get('rotation') or [])[:1]
+    values = [*coords, *[None] * (3 - len(coords)), *rotation, *[None] * (1 - len(rotation))]
+    return element_data['element_name'], *[None if x is None else float(x) for x in values]
+
+
+def relocate(project, data: dict, batch_size: int, cache=zone_cache, executor=None) -> dict:
+    """
+    Locate elements, recomputing only those changed since their stored location.
+
+    Stored elements are matched by their full identity first, then by name
+    when only one request entry and one stored element have that name. When
+    the grid hash differs from the stored one every element is recomputed.
+    New locations and footprint bounds are saved on the matched elements,
+    unmatched elements are located but not saved.
+    """
+    grid = grids_key(data)
+    entries = data['elements']
+    signatures = [element_signature(x) for x in entries]
+    identities = [location_identity(x) for x in entries]
+
+    by_identity = {}
+    by_name = {}
+    names = list({x[0] for x in identities})
+    for id_n in range(0, len(names), batch_size):
+        for element in Element.objects.filter(project=project, element_name__in=names[id_n:id_n + batch_size]):
+            by_identity.setdefault(element_identity(element), []).append(element)
+            by_name.setdefault(element.element_name, []).append(element)
+
+    requested = Counter(x[0] for x in identities)
+    matched = []
+    for identity in identities:
+        elements = by_identity.get(identity)
+        if elements is None and requested[identity[0]] == 1 and len(by_name.get(identity[0], [])) == 1:
+            elements = by_name[identity[0]]
+        matched.append(elements or [])
+
+    locations = {}
+    changed = []
+    for id_e, (elements, signature) in enumerate(zip(matched, signatures)):
+        if elements and all(x.location_grid == grid and x.location_signature == signature for x in elements):
+            locations[id_e] = (elements[0].location_building, elements[0].location_zone)
+        else:
+            changed.append(id_e)
+
+    bounds = {}
+    if changed:
+        # Changed entries are located under their request position, names may repeat.
+        elements_data = [entries[id_e] | {'element_name': id_e} for id_e in changed]
+        for x in process_data(data | {'elements': elements_data}, cache, executor):
+            locations[x[0][0]] = (x[1], x[2][0])
+            bounds[x[0][0]] = x[0][1].bounds
+
+    updated = {}
+    for id_e in changed:
+        if id_e not in locations:
+            continue
+        building, zone = locations[id_e]
+        for element in matched[id_e]:
+            element.location_building = building
+            element.location_zone = zone
+            element.location_signature = signatures[id_e]
+            element.location_grid = grid
+            for key, value in zip(BOUNDS_FIELDS, bounds[id_e]):
+                setattr(element, key, value)
+            updated[element.id] = element
+
+    with transaction.atomic():
+        Element.objects.bulk_update(updated.values(), ['location_building', 'location_zone', 'location_signature',
+                                                       'location_grid', *BOUNDS_FIELDS], batch_size=batch_size)
+
+    return {
+        'elements': [[x['element_name'], *locations[id_e]] for id_e, x in enumerate(entries) if id_e in locations],
+        'relocated': len(changed),
+        'reused': len(entries) - len(changed),
+    }
@@ -0,0 +1,36 @@
+import unittest
+import gzip
+import io
+import zlib
+from django.core.exceptions import BadRequest, RequestDataTooBig
+from api.components.decompression import *
+
+
+class Test_Decompression(unittest.TestCase):
+
+    body = b'{"element_name": "W_123", "coord_x": 123}\n' * 10000
+
+    def test_decompressed(self):
+        self.assertEqual(decompressed(io.BytesIO(gzip.compress(self.body)), 'gzip', len(self.body)).read(), self.body)
+        self.assertEqual(decompressed(io.BytesIO(zlib.compress(self.body)), 'deflate', len(self.body)).read(), self.body)
+
+        lines = list(decompressed(io.BytesIO(gzip.compress(self.body)), 'gzip', len(self.body)))
+        self.assertEqual(len(lines), 10000)
+
+    def test_multiple_members(self):
+        members = gzip.compress(self.body) + gzip.compress(b'{"element_name": "W_124"}\n')
+        self.assertEqual(decompressed(io.BytesIO(members), 'gzip', len(self.body) + 26).read(),
+                         self.body + b'{"element_name": "W_124"}\n')
+
+        with self.assertRaises(BadRequest):
+            decompressed(io.BytesIO(zlib.compress(self.body) + b'trailing'), 'deflate', len(self.body)).read()
+
+    def test_max_size(self):
+        with self.assertRaises(RequestDataTooBig):
+            decompressed(io.BytesIO(gzip.compress(self.body)), 'gzip', len(self.body) - 1).read()
+
+    def test_invalid(self):
+        with self.assertRaises(BadRequest):
+            decompressed(io.BytesIO(self.body), 'gzip', len(self.body)).read()
+        with self.assertRaises(BadRequest):
+            decompressed(io.BytesIO(gzip.compress(self.body)[:-100]), 'gzip', len(self.body)).read()
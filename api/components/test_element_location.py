@@ -1,19 +1,7 @@
 import unittest
+from shapely import Polygon
 from api.components.element_location import *
-import time
-from functools import wraps
-
-def measure_execution_time(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        execution_time = end_time - start_time
-        print(f"Execution time of {func.__name__}: {execution_time} seconds")
-        return result
-    return wrapper
-    
+
 class Test_ElementLocation(unittest.TestCase):
     
     data_building = {"buildings":
@@ -202,3 +190,74 @@ class Test_ElementLocation(unittest.TestCase):
 
         self.assertCountEqual([[x[0][0], x[1], x[2][0]] for x in processed_data], expected_data)
 
+
+    def test_convex_cells(self):
+        grid_lines = {"1": [[0, 0], [0, 20000]], "2": [[6000, 0], [6000, 20000]],
+                      "A": [[0, 0], [20000, 0]], "B": [[0, 6000], [20000, 6000]]}
+        crossing_lines = grid_lines | {"2": [[6000, 0], [-6000, 20000]]}
+
+        for lines, expected in ((grid_lines, True), (crossing_lines, False)):
+            intersections = intersection_recognition({"grid_lines": lines})
+            points = shapely.get_coordinates([i[1] for i in intersections])
+            self.assertEqual(convex_cells(grid_topology(intersections), points), expected)
+
+    def test_elements_geometry(self):
+        data_elemnet = [
+            {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [90], "size": [600, 300, 3000]},
+            {"element_name": "X_01", "coords": [0, 0, 0], "rotation": [0]},
+            {"element_name": "WS_01", "coords": [9000, 5900, 1500], "rotation": [0], "boundary": [[9000, 5600, 1500], [19000, 5600, 1500], [19000, 5900, 1500], [9000, 5900, 1500]]},
+        ]
+
+        elements = elements_geometry(data_elemnet)
+        self.assertEqual([x[0] for x in elements], ['C_01', 'WS_01'])
+        self.assertTrue(elements[0][1].equals(Polygon([(6000, 5900), (6000, 6500), (5700, 6500), (5700, 5900)])))
+        self.assertTrue(elements[1][1].equals(Polygon([(9000, 5600), (19000, 5600), (19000, 5900), (9000, 5900)])))
+
+        with self.assertRaises(ValueError):
+            elements_geometry([{"element_name": "WS_02", "coords": [0, 0, 0], "rotation": [0], "boundary": []}])
+
+    def test_element_set(self):
+        elements = elements_geometry([
+            {"element_name": "C_01", "coords": [0, 0, 0], "rotation": [0], "size": [600, 300, 3000]},
+            {"element_name": "C_02", "coords": [1000, 0, 0], "rotation": [0], "size": [600, 600, 3000]},
+        ])
+        view = elements.view()
+        elements.resolve([0])
+
+        self.assertEqual(elements.pending().tolist(), [1])
+        self.assertEqual(view.pending().tolist(), [0, 1])
+        self.assertEqual(elements.areas.tolist(), [180000, 360000])
+        self.assertEqual(elements.view((500, -500, 2000, 500)).pending().tolist(), [1])
+        self.assertEqual(grid_extent({"grid_lines": {"1": [[0, 0], [0, 6000]], "A": [[0, 0], [6000, 0]]}}, 'mm'),
+                         (-1000, -1000, 7000, 7000))
+        self.assertEqual(elements[1][0], 'C_02')
+
+    def test_procedure_multiple_buildings(self):
+        data_elemnet = {"elements":
+            [
+                {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+                {"element_name": "C_02", "coords": [-6300, -6300, 1500], "rotation": [0], "size": [600, 600, 3000]},
+                {"element_name": "W_01", "coords": [-12100, -9500, 1500], "rotation": [0], "size": [200, 3000, 2000]},
+                {"element_name": "W_02", "coords": [-39900, 5900, 1500], "rotation": [0], "size": [200, 4000, 2000]},
+            ]
+        }
+
+        processed_data = process_data(self.data_building | data_elemnet)
+        expected_data = [['C_01', 'HUS1', '2/B'], ['C_02', 'HUS2', '2/B'], ['W_01', 'HUS2', '3/B-C'], ['W_02', 'Not found', 'Not found']]
+        self.assertEqual([[x[0][0], x[1], x[2][0]] for x in processed_data], expected_data)
+
+        for executor in (ThreadPoolExecutor(max_workers=2), ProcessPoolExecutor(max_workers=2)):
+            with executor:
+                parallel_data = process_data(self.data_building | data_elemnet, executor=executor)
+            self.assertEqual([[x[0][0], x[1], x[2][0]] for x in parallel_data], expected_data)
+
+    def test_process_stream(self):
+        elements = iter([
+            {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            {"element_name": "C_02", "coords": [11700, 5700, 1500], "rotation": [45], "size": [600, 600, 3000]},
+            {"element_name": "C_03", "coords": [18000, 12100, 1500], "rotation": [0], "size": [600, 600, 3000]},
+        ])
+
+        chunks = list(process_stream(self.data_building, elements, chunk_size=2))
+        self.assertEqual([len(x) for x in chunks], [2, 1])
+        self.assertEqual([[x[0][0], x[1], x[2][0]] for chunk in chunks for x in chunk], [['C_01', 'HUS1', '2/B'], ['C_02', 'HUS1', '3/B'], ['C_03', 'HUS1', '4/C']])
@@ -0,0 +1,33 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from api.components.instrumentation import *
+
+
+class Test_Instrumentation(unittest.TestCase):
+
+    def test_collect(self):
+        with stage('outside'):
+            count('outside', 1)
+
+        with collect() as metrics:
+            with stage('work'):
+                count('items', 2)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(copy_context().run, count, 'items', 3).result()
+
+        self.assertEqual(list(metrics.durations), ['work'])
+        self.assertEqual(metrics.counts, {'items': 5})
+        self.assertRegex(metrics.server_timing(), r'^work;dur=\d+\.\d\d, items;desc="5"$')
+
+    def test_registry(self):
+        registry = MetricsRegistry()
+        with collect() as metrics:
+            with stage('work'):
+                pass
+        registry.record(metrics)
+        registry.record(metrics)
+
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot['requests'], 2)
+        self.assertEqual(snapshot['stages']['work']['count'], 2)
@@ -0,0 +1,37 @@
+import unittest
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from api.components.offload import *
+
+
+class Test_BoundedExecutor(unittest.TestCase):
+
+    def test_saturated(self):
+        release = threading.Event()
+        executor = BoundedExecutor(ThreadPoolExecutor(max_workers=1), max_in_flight=2)
+        futures = [executor.submit(release.wait), executor.submit(release.wait)]
+
+        with self.assertRaises(Saturated):
+            executor.submit(release.wait)
+
+        release.set()
+        executor.executor.shutdown()
+        self.assertTrue(all(future.done() for future in futures))
+
+    def test_run(self):
+        executor = BoundedExecutor(ThreadPoolExecutor(max_workers=1), max_in_flight=1)
+        self.assertEqual(asyncio.run(executor.run(sum, [1, 2])), 3)
+        self.assertEqual(asyncio.run(executor.run(sum, [3, 4])), 7)
+
+    def test_broken_pool(self):
+        factory = partial(ProcessPoolExecutor, max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        executor = BoundedExecutor(factory(), max_in_flight=2, factory=factory)
+        self.assertIsInstance(executor.submit(os._exit, 1).exception(timeout=60), BrokenProcessPool)
+
+        self.assertEqual(executor.submit(sum, [1, 2]).result(timeout=60), 3)
+        executor.executor.shutdown()
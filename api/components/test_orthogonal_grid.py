@@ -0,0 +1,43 @@
+import unittest
+from api.components.element_location import CompiledGrid, elements_geometry, zone_analyze
+from api.components.orthogonal_grid import *
+
+
+class Test_OrthogonalGrid(unittest.TestCase):
+
+    grid = {"grid_lines": {
+        "1": [[0, 0], [0, 50000]],
+        "2": [[6000, 0], [6000, 50000]],
+        "3": [[12000, 0], [12000, 50000]],
+        "A": [[0, 0], [30000, 0]],
+        "B": [[0, 6000], [50000, 6000]],
+        "C": [[0, 12000], [50000, 12000]],
+    }}
+
+    def test_orthogonal_grid(self):
+        self.assertIsNotNone(CompiledGrid(self.grid, 'mm').orthogonal)
+
+        skewed = {"grid_lines": self.grid["grid_lines"] | {"3": [[12000, 0], [12100, 50000]]}}
+        self.assertIsNone(CompiledGrid(skewed, 'mm').orthogonal)
+
+        close = {"grid_lines": self.grid["grid_lines"] | {"4": [[12005, 0], [12005, 50000]]}}
+        self.assertIsNone(CompiledGrid(close, 'mm').orthogonal)
+
+    def test_locate(self):
+        data = [
+            {"element_name": "C_01", "coords": [5700, 5700, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            {"element_name": "W_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [4300, 200, 2000]},
+            {"element_name": "W_02", "coords": [5900, 6600, 1500], "rotation": [0], "size": [200, 4800, 2000]},
+            {"element_name": "S_01", "coords": [6500, 6500, 1500], "rotation": [0], "size": [5000, 5000, 200]},
+            {"element_name": "S_02", "coords": [6500, 6500, 1500], "rotation": [0], "size": [6550, 5000, 200]},
+            {"element_name": "X_01", "coords": [60000, 60000, 1500], "rotation": [0], "size": [600, 600, 3000]},
+        ]
+        grid = CompiledGrid(self.grid, 'mm')
+        elements = elements_geometry(data)
+        located = grid.orthogonal.locate(elements, grid.zones)
+
+        self.assertEqual([[(i, loc[0]) for i, loc in stage] for stage in located],
+                         [[(0, '2/B')], [(1, '2-3/B'), (2, '2/B-C')], [(3, '2-3/B-C')]])
+        # Elements close to a zone border or outside the grid are left to Shapely.
+        self.assertEqual(elements.pending().tolist(), [4, 5])
+        self.assertEqual(zone_analyze(elements_geometry(data[4:5]), grid.zones('area'))[0][2][0], '2-3/B-C')
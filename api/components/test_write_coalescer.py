@@ -0,0 +1,42 @@
+from contextvars import ContextVar
+import os
+import unittest
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'assembly_manager.settings')
+import django
+django.setup()
+
+from api.components.write_coalescer import *
+from management.models import Project
+
+
+class Test_WriteCoalescer(unittest.TestCase):
+
+    def tearDown(self):
+        Project.objects.filter(index__startswith='COALESCE_').delete()
+
+    def test_coalesced_writes(self):
+        def write(index):
+            if index == 'COALESCE_FAIL':
+                Project.objects.create(index='COALESCE_ROLLED_BACK')
+                raise ValueError(index)
+            return Project.objects.create(index=index).index
+
+        coalescer = WriteCoalescer(write, window=0.05, max_batch=64)
+        coalescer.submit('COALESCE_0')
+        futures = [coalescer.submit(f'COALESCE_{i}') for i in range(1, 10)] + [coalescer.submit('COALESCE_FAIL')]
+
+        self.assertEqual([x.result() for x in futures[:-1]], [f'COALESCE_{i}' for i in range(1, 10)])
+        with self.assertRaises(ValueError):
+            futures[-1].result()
+        self.assertEqual(coalescer.stats(), {'batches': 1, 'writes': 11})
+        self.assertEqual(Project.objects.filter(index__startswith='COALESCE_').count(), 10)
+
+    def test_submitter_context(self):
+        request_id = ContextVar('request_id', default=None)
+        coalescer = WriteCoalescer(lambda: request_id.get(), window=0, max_batch=64)
+        token = request_id.set('request-1')
+        try:
+            self.assertEqual(coalescer.submit().result(), 'request-1')
+        finally:
+            request_id.reset(token)
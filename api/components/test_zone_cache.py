@@ -0,0 +1,46 @@
+import unittest
+from api.components.element_location import process_data
+from api.components.zone_cache import *
+
+
+class Test_ZoneCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = ZoneCache(maxsize=2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 3)
+        cache.get('c', lambda: 4)
+
+        self.assertEqual(cache.get('a', lambda: 5), 1)
+        self.assertEqual(cache.get('b', lambda: 6), 6)
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 4, 'size': 2, 'maxsize': 2})
+
+    def test_grid_key(self):
+        grid1 = {"grid_lines": {"1": [[0, 0], [0, 5000]], "A": [[0, 0], [5000, 0]]}}
+        grid2 = {"grid_lines": {"1": [[0.0, 0.0], [0.0, 5000.0]], "A": [[0, 0], [5000, 0]]}}
+        grid3 = {"grid_lines": {"A": [[0, 0], [5000, 0]], "1": [[0, 0], [0, 5000]]}}
+
+        self.assertEqual(grid_key(grid1, 'mm'), grid_key(grid2, 'mm'))
+        self.assertNotEqual(grid_key(grid1, 'mm'), grid_key(grid1, 'm'))
+        self.assertNotEqual(grid_key(grid1, 'mm'), grid_key(grid3, 'mm'))
+
+    def test_process_data_hit(self):
+        cache = ZoneCache()
+        data_building = {"buildings": {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}}}
+        data_elemnet = {"elements":
+            [
+                {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            ]
+        }
+
+        first = process_data(data_building | data_elemnet, cache=cache)
+        second = process_data(data_building | data_elemnet, cache=cache)
+        self.assertEqual([[x[0][0], x[1], x[2][0]] for x in first], [[x[0][0], x[1], x[2][0]] for x in second])
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hits'], 1)
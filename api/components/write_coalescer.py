@@ -0,0 +1,96 @@
+from concurrent.futures import Future
+from contextvars import copy_context
+from functools import cache
+import asyncio
+import queue
+import threading
+import time
+
+from django.db import close_old_connections, transaction
+
+
+class WriteCoalescer:
+    """
+    Single writer thread committing the writes of concurrent requests together.
+
+    The first queued write opens a batch, writes arriving within window
+    seconds join it up to max_batch. Every write runs in its own savepoint of
+    one transaction, so a failing write only rolls back itself, and results
+    are delivered once the transaction is committed. Writes run in a copy of
+    the submitting context, so request metrics still see their stages.
+
+    The batch shares its commit: when the commit itself fails, for instance
+    on a locked database, every write of the batch fails with that error.
+    Writes cancelled before their batch starts are skipped.
+    """
+
+    def __init__(self, write, window: float, max_batch: int):
+        self.write = write
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, *args) -> Future:
+        future = Future()
+        self._queue.put((future, copy_context(), args))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-coalescer', daemon=True)
+                self._thread.start()
+        return future
+
+    async def run(self, *args):
+        """
+        Queue a write and wait for its committed result without blocking the event loop.
+        """
+        return await asyncio.wrap_future(self.submit(*args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'batches': self.batches, 'writes': self.writes}
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self._commit([x for x in batch if x[0].set_running_or_notify_cancel()])
+
+    def _commit(self, batch: list):
+        close_old_connections()
+        results = []
+        try:
+            with transaction.atomic():
+                for future, context, args in batch:
+                    try:
+                        with transaction.atomic():
+                            results.append((future, context.run(self.write, *args), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            results = [(future, None, e) for future, *_ in batch]
+
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+@cache
+def write_coalescer(write, window: float, max_batch: int) -> WriteCoalescer:
+    """
+    Shared coalescer of one write function.
+    """
+    return WriteCoalescer(write, window, max_batch)
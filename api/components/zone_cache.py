@@ -0,0 +1,67 @@
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+
+
+def grid_key(b_data: dict, unit: str) -> str:
+    """
+    Canonical hash of a building grid and its unit.
+
+    Axis order is kept because it decides the zone order, coordinates are
+    compared as floats so 6000 and 6000.0 share an entry.
+    """
+    grid = [[name, [[float(c) for c in vertex[:2]] for vertex in axis]] for name, axis in b_data['grid_lines'].items()]
+    payload = json.dumps([unit, grid], separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def grids_etag(keys: list) -> str:
+    """
+    Hash of (building name, grid key) pairs, in building order.
+    """
+    payload = json.dumps([[b_name, key] for b_name, key in keys])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ZoneCache:
+    """
+    Bounded LRU cache of compiled building grids.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """
+        Return the entry stored under key, building it with factory on a miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = factory()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
@@ -0,0 +1,66 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework import status
+from api.components.decompression import decompressed, ENCODINGS
+from api.components.instrumentation import collect, registry
+
+
+class ServerTimingMiddleware:
+    """
+    Collect per-stage metrics of every request and report them in a Server-Timing header.
+
+    Streaming responses only report the stages run before their body is sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect() as metrics:
+            with metrics.stage('total'):
+                response = self.get_response(request)
+        return self.report(response, metrics)
+
+    async def __acall__(self, request):
+        with collect() as metrics:
+            with metrics.stage('total'):
+                response = await self.get_response(request)
+        return self.report(response, metrics)
+
+    @staticmethod
+    def report(response, metrics):
+        registry.record(metrics)
+        response['Server-Timing'] = metrics.server_timing()
+        return response
+
+
+class RequestDecompressionMiddleware(MiddlewareMixin):
+    """
+    Inflate gzip or deflate request bodies while views read them.
+
+    The decompressed size is capped by REQUEST_MAX_DECOMPRESSED_SIZE, other
+    encodings are answered with 415.
+    """
+
+    def process_request(self, request):
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return None
+        if encoding not in ENCODINGS:
+            return JsonResponse({'error': f'Unsupported Content-Encoding: {encoding}'},
+                                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        request._stream = decompressed(request._stream, encoding, settings.REQUEST_MAX_DECOMPRESSED_SIZE)
+        del request.META['HTTP_CONTENT_ENCODING']
+        return None
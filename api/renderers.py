@@ -0,0 +1,96 @@
+import struct
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+COLUMNS_MAGIC = b'ELC1'
+COLUMNS_HEADER = struct.Struct('<4sIIII')
+
+
+class ElementColumnsRenderer(BaseRenderer):
+    """
+    Binary columnar encoding of [element, building, zone] rows.
+
+    Little-endian layout: magic, row count, string table size, integer width
+    and names byte size as uint32; the byte length of every element name and
+    of every table string; the table index of every building and zone; then
+    the UTF-8 element names and table strings back to back. Integers are
+    uint16 when they all fit, else uint32. Responses without element rows,
+    like errors, are rendered as JSON.
+    """
+    media_type = 'application/x-element-columns'
+    format = 'columns'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict) or 'elements' not in data:
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                response['Content-Type'] = JSONRenderer.media_type
+            return JSONRenderer().render(data, accepted_media_type, renderer_context)
+        return encode_columns(data['elements'])
+
+
+def encode_strings(values) -> tuple:
+    """
+    UTF-8 bytes of the joined strings and the byte length of each.
+    """
+    values = list(map(str, values))
+    joined = ''.join(values)
+    if joined.isascii():
+        return joined.encode(), np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    encoded = [x.encode() for x in values]
+    return b''.join(encoded), np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+
+
+def decode_strings(content: bytes, lengths: np.ndarray) -> list:
+    ends = np.cumsum(lengths, dtype=np.int64).tolist()
+    starts = [0, *ends[:-1]]
+    if content.isascii():
+        text = content.decode()
+        return [text[start:end] for start, end in zip(starts, ends)]
+    return [content[start:end].decode() for start, end in zip(starts, ends)]
+
+
+def encode_columns(rows: list) -> bytes:
+    """
+    Encode element names as they are, buildings and zones through one deduplicated string table.
+    """
+    buildings = [x[1] for x in rows]
+    zones = [x[2] for x in rows]
+    table = {x: id_s for id_s, x in enumerate(dict.fromkeys(buildings + zones))}
+    names, name_lengths = encode_strings([x[0] for x in rows])
+    strings, string_lengths = encode_strings(table)
+
+    width = 2 if max(len(table), name_lengths.max(initial=0), string_lengths.max(initial=0)) <= 0xFFFF else 4
+    dtype = f'<u{width}'
+    return b''.join([
+        COLUMNS_HEADER.pack(COLUMNS_MAGIC, len(rows), len(table), width, len(names)),
+        name_lengths.astype(dtype).tobytes(),
+        string_lengths.astype(dtype).tobytes(),
+        np.fromiter(map(table.__getitem__, buildings), dtype=dtype, count=len(rows)).tobytes(),
+        np.fromiter(map(table.__getitem__, zones), dtype=dtype, count=len(rows)).tobytes(),
+        names,
+        strings,
+    ])
+
+
+def decode_columns(content: bytes) -> list:
+    """
+    Return the [element, building, zone] rows of an ElementColumnsRenderer body.
+    """
+    magic, row_count, table_size, width, names_size = COLUMNS_HEADER.unpack_from(content)
+    if magic != COLUMNS_MAGIC:
+        raise ValueError('Not an element columns body')
+
+    offset = COLUMNS_HEADER.size
+    arrays = []
+    for count in (row_count, table_size, row_count, row_count):
+        arrays.append(np.frombuffer(content, dtype=f'<u{width}', count=count, offset=offset))
+        offset += count * width
+    name_lengths, string_lengths, buildings, zones = arrays
+
+    names = decode_strings(content[offset:offset + names_size], name_lengths)
+    table = decode_strings(content[offset + names_size:], string_lengths)
+    return [[name, table[building], table[zone]] for name, building, zone in zip(names, buildings.tolist(), zones.tolist())]
@@ -1,4 +1,12 @@
+import gzip
+import json
+import threading
+import time
 import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 from datetime import datetime
 import os
 from django.conf import settings
@@ -7,9 +15,20 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'assembly_manager.settings')
 import django
 django.setup()
 
+from django.db import connection, OperationalError
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
-from management.models import Element, Project
+from shapely.errors import GEOSException
+from api.components.element_instance import upsert_elements
+from api.components.element_location import zone_cache
+from api.components.jobs import job_executor
+from api.components.offload import BoundedExecutor
+from api.components.write_coalescer import WriteCoalescer
+from api.renderers import decode_columns
+from api.views import ElementLocationStream
+from management.models import Element, Job, Project
 
 
 class Test_ElementInstance(unittest.TestCase):
@@ -60,4 +79,554 @@ class Test_ElementInstance(unittest.TestCase):
 
         self.assertFalse(Element.objects.filter(
             element_name=self.elements_data[0]['element_name']
-        ).exists())
\ No newline at end of file
+        ).exists())
+
+    def test_element_instance_bulk(self):
+        elements_data = [{
+            "element_name": f"W_{i}",
+            "coord_x": i * 100,
+            "coord_y": 223,
+            "coord_z": 124,
+            "rotation": 90,
+            "production_status": "Planned"
+        } for i in range(50)]
+
+        # The upsert runs on the writer thread, its queries are captured there.
+        queries = []
+        def upsert(*args):
+            with CaptureQueriesContext(connection) as captured:
+                result = upsert_elements(*args)
+            queries.extend(captured)
+            return result
+
+        with mock.patch('api.views.element_writer', return_value=WriteCoalescer(upsert, window=0, max_batch=64)):
+            response = self.client.post('/api/element_instance/', {
+                'elements': elements_data,
+                'index': 'BULK'
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (50, 0, 0))
+        self.assertGreater(len(queries), 0)
+        self.assertLess(len(queries), 10)
+
+        for element_data in elements_data:
+            element_data['production_status'] = 'Produced'
+        elements_data.append({"element_name": "W_X", "coord_x": 1, "coord_y": 1, "coord_z": 1, "rotation": 0, "assembly_date": "date"})
+
+        response = self.client.post('/api/element_instance/', {
+            'elements': elements_data,
+            'index': 'BULK'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (0, 50, 1))
+        self.assertEqual(response.data['errors'][0]['index'], 50)
+        self.assertEqual(Element.objects.filter(project__index='BULK', production_status='Produced').count(), 50)
+
+        Project.objects.filter(index='BULK').delete()
+
+    def test_element_instance_bulk_delete(self):
+        elements_data = [{"element_name": f"W_{i}", "coord_x": i * 100, "coord_y": 223, "coord_z": None, "rotation": 90}
+                         for i in range(400)]
+        self.client.post('/api/element_instance/', {'elements': elements_data, 'index': 'BULK_DELETE'}, format='json')
+
+        delete_data = elements_data[:300] + [{"element_name": "W_X", "coord_x": 1, "coord_y": 1, "coord_z": 1, "rotation": 0},
+                                             {"element_name": "W_Y"}]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete('/api/element_instance/', {'elements': delete_data, 'index': 'BULK_DELETE'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['deleted'], response.data['not_found'], response.data['failed']), (300, 1, 1))
+        self.assertEqual([x['status'] for x in response.data['elements'][299:]], ['deleted', 'not_found', 'invalid'])
+        self.assertLess(len(queries), 15)
+        self.assertEqual(Element.objects.filter(project__index='BULK_DELETE').count(), 100)
+
+        response = self.client.delete('/api/element_instance/', {'elements': delete_data[:1], 'index': 'BULK_DELETE'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        Project.objects.filter(index='BULK_DELETE').delete()
+
+
+class Test_ElementLocationStream(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.grid = {"buildings": {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "3": [[12000, 0], [12000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}}}
+        self.elements = [
+            {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            {"element_name": "W_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [4300, 200, 2000]},
+            {"element_name": "W_02", "coords": [-39900, 5900, 1500], "rotation": [0], "size": [200, 4000, 2000]},
+        ]
+
+    def test_element_location_stream(self):
+        body = '\n'.join(json.dumps(x) for x in [self.grid] + self.elements)
+        response = self.client.post('/api/element_location/stream/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertCountEqual([json.loads(x) for x in lines], [['C_01', 'HUS1', '2/B'], ['W_01', 'HUS1', '2-3/B'], ['W_02', 'Not found', 'Not found']])
+
+    def test_element_location_stream_without_grid(self):
+        body = '\n'.join(json.dumps(x) for x in self.elements)
+        response = self.client.post('/api/element_location/stream/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+    def test_element_location_stream_geometry_error(self):
+        def chunks():
+            raise GEOSException('TopologyException')
+            yield
+
+        lines = list(ElementLocationStream.encode(chunks()))
+        self.assertEqual(json.loads(lines[0]), {'error': 'Invalid element data: TopologyException'})
+
+
+class Test_ElementLocationColumns(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.data = {"buildings": {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}}, "elements": [
+            {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            {"element_name": "C_02", "coords": [-40000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            {"element_name": "C_03", "coords": [0, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+        ]}
+
+    def test_element_location_columns(self):
+        response = self.client.generic('GET', '/api/element_location/', json.dumps(self.data), content_type='application/json',
+                                       HTTP_ACCEPT='application/x-element-columns')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-element-columns')
+        self.assertEqual(decode_columns(response.content),
+                         [['C_01', 'HUS1', '2/B'], ['C_03', 'HUS1', '1/B'], ['C_02', 'Not found', 'Not found']])
+
+        response = self.client.generic('GET', '/api/element_location/', json.dumps(self.data), content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_element_location_compressed(self):
+        self.data['elements'] = [x | {"element_name": f"{x['element_name']}_{i}"} for i in range(20) for x in self.data['elements']]
+        body = gzip.compress(json.dumps(self.data).encode())
+        response = self.client.generic('GET', '/api/element_location/', body, content_type='application/json',
+                                       HTTP_CONTENT_ENCODING='gzip', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['elements'][0], ['C_01_0', 'HUS1', '2/B'])
+
+        response = self.client.generic('GET', '/api/element_location/', body[:-10], content_type='application/json',
+                                       HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.generic('GET', '/api/element_location/', body, content_type='application/json',
+                                       HTTP_CONTENT_ENCODING='br')
+        self.assertEqual(response.status_code, 415)
+
+    def test_element_location_columns_error(self):
+        response = self.client.generic('GET', '/api/element_location/?format=columns', 'x', content_type='text/plain')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('error', json.loads(response.content))
+
+        self.data['elements'][0] = {"element_name": "S_01", "coords": [0, 0, 0], "rotation": [0], "boundary": []}
+        response = self.client.generic('GET', '/api/element_location/', json.dumps(self.data), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        self.data['elements'][0] = {"element_name": "C_03", "coords": [0, 0, 0], "size": [600, 600, 3000]}
+        response = self.client.generic('GET', '/api/element_location/', json.dumps(self.data), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class Test_ElementRelocation(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.project = Project.objects.create(index='RELOCATE')
+        Element.objects.bulk_create([Element(project=self.project, element_name=x) for x in ('C_01', 'C_02')])
+        self.data = {"index": "RELOCATE", "buildings": {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "3": [[12000, 0], [12000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}}, "elements": [
+            {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            {"element_name": "C_02", "coords": [11700, 5700, 1500], "rotation": [0], "size": [600, 600, 3000]},
+        ]}
+
+    def tearDown(self):
+        self.project.delete()
+
+    def test_element_relocation(self):
+        response = self.client.post('/api/element_location/relocate/', self.data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['relocated'], response.data['reused']), (2, 0))
+        self.assertEqual(response.data['elements'], [['C_01', 'HUS1', '2/B'], ['C_02', 'HUS1', '3/B']])
+        self.assertEqual(Element.objects.get(project=self.project, element_name='C_01').location_zone, '2/B')
+
+        self.data['elements'][1]['coords'] = [5700, 5700, 1500]
+        response = self.client.post('/api/element_location/relocate/', self.data, format='json')
+        self.assertEqual((response.data['relocated'], response.data['reused']), (1, 1))
+        self.assertEqual(response.data['elements'], [['C_01', 'HUS1', '2/B'], ['C_02', 'HUS1', '2/B']])
+
+        self.data['buildings']['HUS1']['grid_lines']['2'] = [[6100, 0], [6100, 50000]]
+        response = self.client.post('/api/element_location/relocate/', self.data, format='json')
+        self.assertEqual((response.data['relocated'], response.data['reused']), (2, 0))
+
+    def test_element_relocation_invalid(self):
+        del self.data['elements'][0]['rotation']
+        response = self.client.post('/api/element_location/relocate/', self.data, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_element_relocation_same_name(self):
+        Element.objects.bulk_create([Element(project=self.project, element_name='B_01', coord_x=x, coord_y=5900, coord_z=1500,
+                                             rotation=0) for x in (6000, 11700)])
+        self.data['elements'] = [
+            {"element_name": "B_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            {"element_name": "B_01", "coords": [11700, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+        ]
+        response = self.client.post('/api/element_location/relocate/', self.data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['elements'], [['B_01', 'HUS1', '2/B'], ['B_01', 'HUS1', '3/B']])
+        self.assertEqual(list(Element.objects.filter(project=self.project, element_name='B_01').order_by('coord_x')
+                              .values_list('location_zone', 'min_x')), [('2/B', 6000), ('3/B', 11700)])
+
+        response = self.client.post('/api/element_location/relocate/', self.data, format='json')
+        self.assertEqual((response.data['relocated'], response.data['reused']), (0, 2))
+        self.assertEqual(response.data['elements'], [['B_01', 'HUS1', '2/B'], ['B_01', 'HUS1', '3/B']])
+
+
+class Test_Grid(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buildings = {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "3": [[12000, 0], [12000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}, "HUS2": {"grid_lines": {
+            "1": [[100000, 0], [100000, 20000]],
+            "2": [[107000, 3000], [107000, 20000]],
+            "A": [[100000, 0], [110000, 0]],
+            "B": [[100000, 6000], [110000, 9000]],
+        }}}
+        self.elements = [
+            {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+            {"element_name": "W_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [4300, 200, 2000]},
+            {"element_name": "S_01", "coords": [101000, 1000, 1500], "rotation": [0], "size": [5000, 4000, 200]},
+            {"element_name": "W_02", "coords": [-39900, 5900, 1500], "rotation": [0], "size": [200, 4000, 2000]},
+        ]
+
+    def tearDown(self):
+        Project.objects.filter(index='GRID').delete()
+
+    def locate(self, data):
+        return self.client.generic('GET', '/api/element_location/', json.dumps(data), content_type='application/json')
+
+    def test_grid(self):
+        response = self.client.post('/api/grid/', {'index': 'GRID', 'buildings': self.buildings}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['grid_version'], response.data['changed']), (1, ['HUS1', 'HUS2']))
+        etag = response['ETag']
+
+        response = self.client.get('/api/grid/', {'index': 'GRID'})
+        self.assertEqual(response.data['buildings'], self.buildings)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/grid/', {'index': 'GRID'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        inline = self.locate({'buildings': self.buildings, 'elements': self.elements})
+        zone_cache.clear()
+        stored = self.locate({'index': 'GRID', 'grid_version': 1, 'elements': self.elements})
+        self.assertEqual(stored.status_code, 200)
+        self.assertEqual(stored.data, inline.data)
+
+        response = self.client.post('/api/grid/', {'index': 'GRID', 'buildings': self.buildings}, format='json')
+        self.assertEqual((response.data['grid_version'], response.data['changed']), (1, []))
+
+        self.buildings['HUS1']['grid_lines']['2'] = [[6100, 0], [6100, 50000]]
+        response = self.client.post('/api/grid/', {'index': 'GRID', 'buildings': self.buildings}, format='json')
+        self.assertEqual((response.data['grid_version'], response.data['changed']), (2, ['HUS1']))
+
+        response = self.locate({'index': 'GRID', 'grid_version': 1, 'elements': self.elements})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.data['grid_version'], 2)
+        response = self.locate({'index': 'GRID', 'grid_etag': etag.strip('"'), 'elements': self.elements})
+        self.assertEqual(response.status_code, 412)
+
+    def test_grid_missing(self):
+        self.assertEqual(self.client.get('/api/grid/', {'index': 'GRID'}).status_code, 404)
+        self.assertEqual(self.locate({'index': 'GRID', 'elements': self.elements}).status_code, 404)
+        response = self.client.post('/api/grid/', {'index': 'GRID', 'buildings': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class Test_ElementList(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.project = Project.objects.create(index='LIST')
+        Element.objects.bulk_create([Element(
+            project=self.project, element_name=f'E_{i:02}', coord_x=i,
+            production_status='Produced' if i % 2 else 'Planned',
+            production_date=datetime(2024, 1, 1 + i).date(),
+        ) for i in range(25)])
+
+    def tearDown(self):
+        self.project.delete()
+
+    def test_element_list(self):
+        names = []
+        params = {'index': 'LIST', 'limit': 10, 'fields': 'element_name'}
+        while True:
+            response = self.client.get('/api/element_list/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(all(x.keys() == {'id', 'element_name'} for x in response.data['elements']))
+            names += [x['element_name'] for x in response.data['elements']]
+            if response.data['next'] is None:
+                break
+            params['after'] = response.data['next']
+        self.assertEqual(names, [f'E_{i:02}' for i in range(25)])
+
+    def test_element_list_filters(self):
+        response = self.client.get('/api/element_list/', {'index': 'LIST', 'production_status': 'Produced',
+                                                          'production_date__gte': '2024-01-10', 'production_date__lte': '2024-01-20'})
+        self.assertEqual([x['element_name'] for x in response.data['elements']], ['E_09', 'E_11', 'E_13', 'E_15', 'E_17', 'E_19'])
+        self.assertEqual(json.loads(response.content)['elements'][0]['production_date'], '2024-01-10')
+
+        self.assertEqual(self.client.get('/api/element_list/', {'index': 'LIST', 'fields': 'secret'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/element_list/', {'index': 'LIST', 'production_date__gte': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/element_list/', {'index': 'NOLIST'}).status_code, 404)
+
+
+class Test_ElementStatus(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.elements = [
+            {"element_name": "W_01", "coord_x": 0, "coord_y": 0, "coord_z": 0, "rotation": 0, "production_status": "Produced",
+             "planned_assembly_date": "2024-01-10", "assembly_date": "2024-01-09"},
+            {"element_name": "W_02", "coord_x": 0, "coord_y": 0, "coord_z": 0, "rotation": 0, "production_status": "Produced",
+             "planned_assembly_date": "2024-01-10", "assembly_date": "2024-01-12"},
+            {"element_name": "W_03", "coord_x": 0, "coord_y": 0, "coord_z": 0, "rotation": 0,
+             "planned_assembly_date": "2024-01-10"},
+        ]
+        self.client.post('/api/element_instance/', {'index': 'STATUS', 'elements': self.elements}, format='json')
+
+    def tearDown(self):
+        Project.objects.filter(index='STATUS').delete()
+
+    def test_element_status(self):
+        response = self.client.get('/api/element_status/', {'index': 'STATUS'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['production_status'], [{'value': 'Produced', 'count': 2}, {'value': None, 'count': 1}])
+        self.assertEqual(response.data['assembly'], {'total': 3, 'planned': 3, 'assembled': 2, 'on_time': 1, 'late': 1,
+                                                     'unplanned': 0, 'overdue': 1})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/element_status/', {'index': 'STATUS'})
+        self.assertEqual(len(queries), 1)
+
+        self.client.delete('/api/element_instance/', {'index': 'STATUS', 'elements': self.elements[:1]}, format='json')
+        response = self.client.get('/api/element_status/', {'index': 'STATUS'})
+        self.assertEqual(response.data['assembly']['total'], 2)
+
+
+class Test_ElementQuery(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.post('/api/grid/', {'index': 'QUERY', 'buildings': {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}}}, format='json')
+        self.client.post('/api/element_instance/', {'index': 'QUERY', 'elements': [
+            {"element_name": "C_01", "coord_x": 6100, "coord_y": 5900, "coord_z": 0, "rotation": 0},
+            {"element_name": "C_02", "coord_x": 3000, "coord_y": 3000, "coord_z": 0, "rotation": 0},
+            {"element_name": "C_03", "coord_x": 20000, "coord_y": 20000, "coord_z": 0, "rotation": 0},
+        ]}, format='json')
+
+    def tearDown(self):
+        Project.objects.filter(index='QUERY').delete()
+
+    def query(self, data):
+        response = self.client.generic('GET', '/api/element_query/', json.dumps(data), content_type='application/json')
+        return response.status_code, sorted(x['element_name'] for x in response.data.get('elements', []))
+
+    def test_element_query(self):
+        self.assertEqual(self.query({'index': 'QUERY', 'zone': '2/B'}), (200, ['C_01']))
+        self.assertEqual(self.query({'index': 'QUERY', 'zone': '1-2/A-B', 'building': 'HUS1'}), (200, ['C_01', 'C_02']))
+        self.assertEqual(self.query({'index': 'QUERY', 'bbox': [0, 0, 20000, 20000]}), (200, ['C_01', 'C_02', 'C_03']))
+        self.assertEqual(self.query({'index': 'QUERY', 'polygon': [[0, 0], [20000, 0], [0, 20000]]}), (200, ['C_01', 'C_02']))
+
+        response = self.client.get('/api/element_query/', {'index': 'QUERY', 'bbox': '2000,2000,4000,4000'})
+        self.assertEqual([x['element_name'] for x in response.data['elements']], ['C_02'])
+
+        # Relocation stores the footprint, the column then reaches into 1-2/B.
+        self.client.post('/api/element_location/relocate/', {'index': 'QUERY', 'elements': [
+            {"element_name": "C_01", "coords": [5900, 5900, 0], "rotation": [0], "size": [600, 600, 3000]},
+        ]}, format='json')
+        self.assertEqual(self.query({'index': 'QUERY', 'bbox': [5000, 6200, 5950, 6400]}), (200, ['C_01']))
+
+        self.client.delete('/api/element_instance/', {'index': 'QUERY', 'elements': [
+            {"element_name": "C_02", "coord_x": 3000, "coord_y": 3000, "coord_z": 0, "rotation": 0},
+        ]}, format='json')
+        self.assertEqual(self.query({'index': 'QUERY', 'bbox': [0, 0, 20000, 20000]}), (200, ['C_01', 'C_03']))
+
+    def test_element_query_errors(self):
+        self.assertEqual(self.query({'index': 'QUERY', 'zone': '9/Z'})[0], 404)
+        self.assertEqual(self.query({'index': 'QUERY', 'bbox': [1, 1, 0, 0]})[0], 400)
+        self.assertEqual(self.query({'index': 'QUERY', 'polygon': [[0, 0], [1, 1]]})[0], 400)
+        self.assertEqual(self.query({'index': 'QUERY'})[0], 400)
+
+
+class Test_LocationJobs(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.data = {"buildings": {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "3": [[12000, 0], [12000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}}, "elements": [
+            {"element_name": f"C_{i}", "coords": [6000 * (i % 3), 5900, 1500], "rotation": [0], "size": [600, 600, 3000]}
+            for i in range(30)
+        ] + [{"element_name": "W_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [4300, 200, 2000]},
+             {"element_name": "W_02", "coords": [-39900, 5900, 1500], "rotation": [0], "size": [200, 4000, 2000]}]}
+
+    def test_location_job(self):
+        with mock.patch.object(settings, 'LOCATION_JOB_CHUNK_SIZE', 10):
+            response = self.client.post('/api/jobs/', self.data, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+        self.assertIn(self.client.get(f'/api/jobs/{job_id}/result/').status_code, (200, 409))
+
+        deadline = time.monotonic() + 60
+        while response.data['status'] in ('queued', 'running') and time.monotonic() < deadline:
+            time.sleep(0.1)
+            response = self.client.get(f'/api/jobs/{job_id}/')
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['progress'], {'elements': 32, 'processed': 32, 'point': 30, 'line': 1, 'area': 0, 'not_found': 1})
+
+        response = self.client.get(f'/api/jobs/{job_id}/result/')
+        self.assertCountEqual(response.data['elements'], [[x[0], x[1], x[2]] for x in self.client.generic(
+            'GET', '/api/element_location/', json.dumps(self.data), content_type='application/json').data['elements']])
+        Job.objects.filter(id=job_id).delete()
+
+    def test_location_job_broken_pool(self):
+        executor = job_executor(settings.LOCATION_JOB_WORKERS, settings.LOCATION_JOB_CHUNK_SIZE)
+        self.assertIsInstance(executor.submit(os._exit, 1).exception(timeout=60), BrokenProcessPool)
+        stale = Job.objects.create(payload={}, status=Job.RUNNING)
+
+        response = self.client.post('/api/jobs/', self.data, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+        deadline = time.monotonic() + 60
+        while response.data['status'] in ('queued', 'running') and time.monotonic() < deadline:
+            time.sleep(0.1)
+            response = self.client.get(f'/api/jobs/{job_id}/')
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(Job.objects.get(id=stale.id).status, Job.FAILED)
+        Job.objects.filter(id__in=[job_id, stale.id]).delete()
+
+    def test_location_job_missing(self):
+        self.assertEqual(self.client.get(f'/api/jobs/{uuid.uuid4()}/').status_code, 404)
+        self.assertEqual(self.client.post('/api/jobs/', {'elements': []}, format='json').status_code, 400)
+
+
+class Test_AsyncViews(unittest.TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.data = {"buildings": {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}}, "elements": [
+            {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+        ]}
+
+    def test_async_element_location(self):
+        response = self.client.generic('GET', '/api/async/element_location/', json.dumps(self.data), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"elements": [['C_01', 'HUS1', '2/B']]})
+
+    def test_async_element_location_saturated(self):
+        with mock.patch('api.views.location_offload', return_value=BoundedExecutor(ThreadPoolExecutor(max_workers=1), 0)):
+            response = self.client.generic('GET', '/api/async/element_location/', json.dumps(self.data), content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+
+        broken = BoundedExecutor(ThreadPoolExecutor(max_workers=1), 1)
+        with mock.patch.object(broken, 'submit', side_effect=BrokenProcessPool), \
+                mock.patch('api.views.location_offload', return_value=broken):
+            response = self.client.generic('GET', '/api/async/element_location/', json.dumps(self.data), content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+
+    def test_async_element_instance(self):
+        elements_data = [{"element_name": "W_1", "coord_x": 1, "coord_y": 2, "coord_z": 3, "rotation": 0}]
+        response = self.client.post('/api/async/element_instance/', {'elements': elements_data, 'index': 'ASYNC'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+
+        response = self.client.delete('/api/async/element_instance/', {'elements': elements_data, 'index': 'ASYNC'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Element.objects.filter(project__index='ASYNC').exists())
+        Project.objects.filter(index='ASYNC').delete()
+
+    def test_element_instance_write_locked(self):
+        def write(*args):
+            raise OperationalError('database is locked')
+
+        elements_data = [{"element_name": "W_1", "coord_x": 1, "coord_y": 2, "coord_z": 3, "rotation": 0}]
+        try:
+            with mock.patch('api.views.element_writer', return_value=WriteCoalescer(write, window=0, max_batch=64)):
+                for url in ('/api/element_instance/', '/api/async/element_instance/'):
+                    response = self.client.post(url, {'elements': elements_data, 'index': 'ASYNC'}, content_type='application/json')
+                    self.assertEqual(response.status_code, 503)
+                    self.assertEqual(response['Retry-After'], '1')
+        finally:
+            Project.objects.filter(index='ASYNC').delete()
+
+    def test_element_instance_write_timeout(self):
+        released = threading.Event()
+        writer = WriteCoalescer(lambda *args: released.wait(), window=0, max_batch=64)
+        elements_data = [{"element_name": "W_1", "coord_x": 1, "coord_y": 2, "coord_z": 3, "rotation": 0}]
+        try:
+            with mock.patch('api.views.element_writer', return_value=writer), \
+                    mock.patch.object(settings, 'ELEMENT_WRITE_TIMEOUT', 0.05):
+                for url in ('/api/element_instance/', '/api/async/element_instance/'):
+                    response = self.client.post(url, {'elements': elements_data, 'index': 'ASYNC'}, content_type='application/json')
+                    self.assertEqual(response.status_code, 503)
+                    self.assertEqual(response['Retry-After'], '1')
+        finally:
+            released.set()
+            Project.objects.filter(index='ASYNC').delete()
+
+
+class Test_Metrics(unittest.TestCase):
+    def test_server_timing(self):
+        client = APIClient()
+        data = {"buildings": {"HUS1": {"grid_lines": {
+            "1": [[0, 0], [0, 50000]],
+            "2": [[6000, 0], [6000, 50000]],
+            "A": [[0, 0], [30000, 0]],
+            "B": [[0, 6000], [50000, 6000]],
+        }}}, "elements": [
+            {"element_name": "C_01", "coords": [6000, 5900, 1500], "rotation": [0], "size": [600, 600, 3000]},
+        ]}
+        response = client.generic('GET', '/api/element_location/', json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('elements_geometry;dur=', response['Server-Timing'])
+        self.assertIn('elements;desc="1"', response['Server-Timing'])
+
+        response = client.post('/api/element_instance/', {'index': 'METRICS', 'elements': [
+            {'element_name': 'C_01', 'coord_x': 0, 'coord_y': 0, 'coord_z': 0, 'rotation': 0}]}, format='json')
+        Project.objects.filter(index='METRICS').delete()
+        self.assertIn('db_fetch;dur=', response['Server-Timing'])
+        self.assertIn('db_write;dur=', response['Server-Timing'])
+
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data['stages']['elements_geometry']['count'], 0)
+        self.assertIn('hits', response.data['zone_cache'])
@@ -1,9 +1,22 @@
 from django.urls import path, include
+from django.views.decorators.csrf import csrf_exempt
 
 from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('element_location/', views.ElementLocation.as_view(), name='element_location'),
+    path('element_location/relocate/', views.ElementRelocation.as_view(), name='element_relocation'),
+    path('element_location/stream/', views.ElementLocationStream.as_view(), name='element_location_stream'),
+    path('element_list/', views.ElementList.as_view(), name='element_list'),
+    path('element_status/', views.ElementStatus.as_view(), name='element_status'),
+    path('element_query/', views.ElementQuery.as_view(), name='element_query'),
+    path('grid/', views.Grid.as_view(), name='grid'),
     path('element_instance/', views.ElementInstance.as_view(), name='element_instance'),
+    path('async/element_location/', views.AsyncElementLocation.as_view(), name='async_element_location'),
+    path('jobs/', views.LocationJobs.as_view(), name='location_jobs'),
+    path('jobs/<uuid:job_id>/', views.LocationJob.as_view(), name='location_job'),
+    path('jobs/<uuid:job_id>/result/', views.LocationJobResult.as_view(), name='location_job_result'),
+    path('metrics/', views.Metrics.as_view(), name='metrics'),
+    path('async/element_instance/', csrf_exempt(views.AsyncElementInstance.as_view()), name='async_element_instance'),
 ]
\ No newline at end of file
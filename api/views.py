@@ -1,18 +1,79 @@
-from django.http import HttpResponse
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import OperationalError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from api.components.element_location import process_data
-from management.models import Element, Project
+from rest_framework.settings import api_settings
+from shapely.errors import GEOSException
+from api.components.element_instance import delete_elements, upsert_elements
+from api.components.element_listing import element_page
+from api.components.element_location import building_executor, locate, process_stream, zone_cache
+from api.components.element_query import elements_within, query_regions, RegionError
+from api.components.element_status import invalidate_status, status_summary
+from api.components.grid_store import GridMismatch, load_grid, project_etag, project_grid, save_grid
+from api.components.instrumentation import registry, stage
+from api.components.jobs import submit_location_job
+from api.components.offload import bounded_executor, Saturated
+from api.components.relocation import relocate
+from api.components.write_coalescer import write_coalescer
+from api.renderers import ElementColumnsRenderer
+from management.models import Job, Project, Zone
 from management.serializers import ElementSerializer, ProjectSerializer
 
+# Errors raised by malformed element data in the location views.
+ELEMENT_DATA_ERRORS = (ValueError, TypeError, KeyError, IndexError, GEOSException)
+# Sent with 503 answers of saturated pools and unavailable writes.
+RETRY_HEADERS = {'Retry-After': '1'}
+
+
 def index(request):
     return HttpResponse("API Endpoint")
 
+
+def location_executor(data):
+    """
+    Pool for concurrent buildings, or None to process them in sequence.
+    """
+    workers = settings.ELEMENT_LOCATION_WORKERS
+    if workers > 1 and len(data.get('buildings', {})) > 1:
+        return building_executor(workers, settings.ELEMENT_LOCATION_EXECUTOR)
+    return None
+
+def location_data(data):
+    """
+    Return (data, error, status) with the stored project grid filled in for
+    requests referencing it by index instead of sending buildings.
+    """
+    if not isinstance(data, dict) or 'buildings' in data or 'index' not in data:
+        return data, None, None
+
+    try:
+        project = Project.objects.get(index=data['index'])
+    except Project.DoesNotExist:
+        return None, {'error': 'Project does not exist'}, status.HTTP_404_NOT_FOUND
+    if not project.grid_version:
+        return None, {'error': 'Project has no stored grid'}, status.HTTP_404_NOT_FOUND
+
+    try:
+        buildings = load_grid(project, data.get('grid_version'), data.get('grid_etag'))
+    except GridMismatch as e:
+        return None, {'error': str(e), 'grid_version': project.grid_version}, status.HTTP_412_PRECONDITION_FAILED
+    return data | {'buildings': buildings}, None, None
+
+
 class ElementLocation(APIView):
     """
     Endpoint to return element location based on grid and element coordinates.
     """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ElementColumnsRenderer]
 
     def get(self, request, format=None):
         """
@@ -21,85 +82,457 @@ class ElementLocation(APIView):
         if not request.content_type == 'application/json':
             return Response({'error': 'Request must contain JSON data'}, status=status.HTTP_400_BAD_REQUEST)
 
-        processed_data = process_data(request.data)
+        data, error, error_status = location_data(request.data)
+        if error:
+            return Response(error, status=error_status)
+
+        try:
+            elements = locate(data, executor=location_executor(data))
+        except ELEMENT_DATA_ERRORS as e:
+            return Response({'error': f'Invalid element data: {e}'}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({"elements": [[x[0][0], x[1], x[2][0]] for x in processed_data]}, status=status.HTTP_200_OK)
+        return Response({"elements": elements}, status=status.HTTP_200_OK)
     
 
-class ElementInstance(APIView):
+class ElementRelocation(APIView):
     """
-    Endpoint to create or update element.
+    Endpoint to return element location reusing the zones stored on project elements.
     """
+
     def post(self, request, format=None):
-        data = request.data
-        elements_data = data.get('elements', [])
-        project_index = data.get('index')
+        """
+        Return a list of elements with axis zone, recomputing only elements
+        changed since the last run and store the new zones.
+        """
+        if not request.content_type == 'application/json':
+            return Response({'error': 'Request must contain JSON data'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            project = Project.objects.get(index=project_index)
+            project = Project.objects.get(index=request.data.get('index'))
         except Project.DoesNotExist:
-            project_serializer = ProjectSerializer(data={'index': project_index})
-            if project_serializer.is_valid():
-                project = project_serializer.save()
-            else:
-                return Response(project_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-        for element_data in elements_data:
-            element_identify = {
-                "element_name": element_data["element_name"],
-                "coord_x": element_data["coord_x"],
-                "coord_y": element_data["coord_y"],
-                "coord_z": element_data["coord_z"],
-                "rotation": element_data["rotation"],
-                "project": project.id
-            }
-            try:
-                element = Element.objects.get(**element_identify)
-                for key, value in element_data.items():
-                    setattr(element, key, value)
-                element.save()
-            except Element.DoesNotExist:
-                element_serializer = ElementSerializer(data=element_identify)
-                if element_serializer.is_valid():
-                    element, created = Element.objects.update_or_create(
-                        project=project,
-                        element_name=element_data['element_name'],
-                        defaults=element_data
-                    )
-                else:
-                    return Response(element_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-        return Response({'message': 'Elements created/updated successfully'}, status=status.HTTP_201_CREATED)
+            return Response({'error': 'Project does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        data, error, error_status = location_data(request.data)
+        if error:
+            return Response(error, status=error_status)
+
+        try:
+            result = relocate(project, data, settings.ELEMENT_BATCH_SIZE, executor=location_executor(data))
+        except ELEMENT_DATA_ERRORS as e:
+            return Response({'error': f'Invalid element data: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class ElementLocationStream(APIView):
+    """
+    Endpoint to return element location for elements streamed as NDJSON.
+    """
+
+    def post(self, request, format=None):
+        """
+        Read the building grid, or the index of a project with a stored grid,
+        from the first line and one element per following line, write back
+        one [element, building, zone] line per element.
+        """
+        if not request.content_type == 'application/x-ndjson':
+            return Response({'error': 'Request must contain NDJSON data'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = iter(request.stream or ())
+        try:
+            grid, error, error_status = location_data(json.loads(next(lines)))
+            if error:
+                return Response(error, status=error_status)
+            grid = {'buildings': grid['buildings']}
+        except (StopIteration, ValueError, TypeError, KeyError):
+            return Response({'error': 'First line must contain the building grid'}, status=status.HTTP_400_BAD_REQUEST)
+
+        elements = (json.loads(line) for line in lines if line.strip())
+        chunks = process_stream(grid, elements, executor=location_executor(grid))
+        return StreamingHttpResponse(self.encode(chunks), content_type='application/x-ndjson')
+
+    @staticmethod
+    def encode(chunks):
+        try:
+            for chunk in chunks:
+                yield ''.join(json.dumps([x[0][0], x[1], x[2][0]]) + '\n' for x in chunk)
+        except ELEMENT_DATA_ERRORS as e:
+            yield json.dumps({'error': f'Invalid element data: {e}'}) + '\n'
+
+
+def element_project(project_index):
+    """
+    Return (project, errors) for an index, creating the project if it is missing.
+    """
+    try:
+        return Project.objects.get(index=project_index), None
+    except Project.DoesNotExist:
+        project_serializer = ProjectSerializer(data={'index': project_index})
+        if project_serializer.is_valid():
+            return project_serializer.save(), None
+        return None, project_serializer.errors
+
+
+def element_writer():
+    """
+    Coalescer committing the element upserts of concurrent requests together.
+    """
+    return write_coalescer(upsert_elements, settings.ELEMENT_WRITE_WINDOW, settings.ELEMENT_WRITE_MAX_BATCH)
+
+
+def element_upsert_response(project, result):
+    """
+    Return response data and status of an element upsert result.
+    """
+    if result['created'] or result['updated']:
+        invalidate_status(project)
+    if result['failed'] and not (result['created'] or result['updated']):
+        return result, status.HTTP_400_BAD_REQUEST
+
+    return {'message': 'Elements created/updated successfully'} | result, status.HTTP_201_CREATED
+
+
+def element_instance_post(data):
+    """
+    Create or update elements, return response data and status.
+    """
+    elements_data = data.get('elements', [])
+    project, errors = element_project(data.get('index'))
+    if errors:
+        return errors, status.HTTP_400_BAD_REQUEST
+
+    future = element_writer().submit(project, elements_data, settings.ELEMENT_BATCH_SIZE)
+    try:
+        with stage('write_coalesce'):
+            result = future.result(timeout=settings.ELEMENT_WRITE_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        return {'error': 'Element write timed out, retry later'}, status.HTTP_503_SERVICE_UNAVAILABLE
+    except OperationalError as e:
+        return {'error': f'Element write failed, retry later: {e}'}, status.HTTP_503_SERVICE_UNAVAILABLE
+    return element_upsert_response(project, result)
+
+
+def element_instance_delete(data):
+    """
+    Delete elements, return response data with the outcome of each and status.
+    """
+    elements_data = data.get('elements', [])
+    project, errors = element_project(data.get('index'))
+    if errors:
+        return errors, status.HTTP_400_BAD_REQUEST
+
+    result = delete_elements(project, elements_data, settings.ELEMENT_BATCH_SIZE)
+    if result['deleted']:
+        invalidate_status(project)
+        return {'message': 'Elements deleted successfully'} | result, status.HTTP_200_OK
+    if result['not_found']:
+        return {'error': 'Element does not exist'} | result, status.HTTP_404_NOT_FOUND
+    return result, status.HTTP_400_BAD_REQUEST
+
+
+class ElementInstance(APIView):
+    """
+    Endpoint to create or update element.
+    """
+    def post(self, request, format=None):
+        body, response_status = element_instance_post(request.data)
+        headers = RETRY_HEADERS if response_status == status.HTTP_503_SERVICE_UNAVAILABLE else None
+        return Response(body, status=response_status, headers=headers)
     
     """
     Endpoint to delete element.
     """
     def delete(self, request, format=None):
-        data = request.data
-        elements_data = data.get('elements', [])
-        project_index = data.get('index')
+        body, response_status = element_instance_delete(request.data)
+        return Response(body, status=response_status)
+
+
+class ElementList(APIView):
+    """
+    Endpoint to list the stored elements of a project page by page.
+    """
+
+    def get(self, request, format=None):
+        """
+        Return elements after the id cursor, filtered by status and date,
+        with only the requested fields.
+        """
+        try:
+            project = Project.objects.get(index=request.query_params.get('index'))
+        except Project.DoesNotExist:
+            return Response({'error': 'Project does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            page = element_page(project, request.query_params, settings.ELEMENT_PAGE_SIZE, settings.ELEMENT_PAGE_MAX_SIZE)
+        except ValidationError as e:
+            return Response(e.message_dict, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(page, status=status.HTTP_200_OK)
+
+
+class ElementStatus(APIView):
+    """
+    Endpoint to return element counts of a project by status and assembly date.
+    """
+
+    def get(self, request, format=None):
+        try:
+            project = Project.objects.get(index=request.query_params.get('index'))
+        except Project.DoesNotExist:
+            return Response({'error': 'Project does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        summary = status_summary(project, timeout=settings.ELEMENT_STATUS_CACHE_TIMEOUT)
+        return Response({'index': project.index} | summary, status=status.HTTP_200_OK)
+
+
+class ElementQuery(APIView):
+    """
+    Endpoint to return the stored elements of a project inside a zone, bbox or polygon.
+    """
+
+    def get(self, request, format=None):
+        """
+        Return elements whose bounds intersect the named zone of the stored
+        grid, the bbox [min_x, min_y, max_x, max_y] or the polygon vertices.
+        """
+        params = request.query_params.dict()
+        if isinstance(request.data, dict):
+            params |= request.data
+
+        try:
+            project = Project.objects.get(index=params.get('index'))
+        except Project.DoesNotExist:
+            return Response({'error': 'Project does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            regions, exact = query_regions(project, params)
+        except Zone.DoesNotExist as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except RegionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        elements = elements_within(project, regions, exact, settings.ELEMENT_BATCH_SIZE)
+        return Response({'count': len(elements), 'elements': ElementSerializer(elements, many=True).data},
+                        status=status.HTTP_200_OK)
+
 
+class Grid(APIView):
+    """
+    Endpoint to store the building grid of a project and read it back.
+    """
+
+    def get(self, request, format=None):
+        """
+        Return the stored grid with its version, answer 304 when the ETag is unchanged.
+        """
         try:
-            project = Project.objects.get(index=project_index)
+            project = Project.objects.get(index=request.query_params.get('index'))
         except Project.DoesNotExist:
-            project_serializer = ProjectSerializer(data={'index': project_index})
-            if project_serializer.is_valid():
-                project = project_serializer.save()
-            else:
-                return Response(project_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-        for element_data in elements_data:
-            element_identify = {
-                "element_name": element_data["element_name"],
-                "coord_x": element_data["coord_x"],
-                "coord_y": element_data["coord_y"],
-                "coord_z": element_data["coord_z"],
-                "rotation": element_data["rotation"],
-                "project": project.id
-            }
-            try:
-                element = Element.objects.get(**element_identify)
-                element.delete()
-                return Response({'message': 'Element deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
-            except Element.DoesNotExist:
-                return Response({'error': 'Element does not exist'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({'error': 'Project does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{project_etag(project.buildings.all())}"'
+        headers = {'ETag': etag}
+        if etag in (x.strip() for x in request.headers.get('If-None-Match', '').split(',')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response({
+            'index': project.index,
+            'grid_version': project.grid_version,
+            'grid_etag': etag.strip('"'),
+            'buildings': project_grid(project),
+        }, status=status.HTTP_200_OK, headers=headers)
+
+    def post(self, request, format=None):
+        """
+        Replace the stored grid, zones are computed once for every changed building.
+        """
+        if not request.content_type == 'application/json':
+            return Response({'error': 'Request must contain JSON data'}, status=status.HTTP_400_BAD_REQUEST)
+
+        buildings = request.data.get('buildings')
+        if not isinstance(buildings, dict) or not all(isinstance(x, dict) and isinstance(x.get('grid_lines'), dict)
+                                                      for x in buildings.values()):
+            return Response({'error': 'Request must contain buildings with grid_lines'}, status=status.HTTP_400_BAD_REQUEST)
+
+        project, errors = element_project(request.data.get('index'))
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = save_grid(project, buildings, settings.ELEMENT_BATCH_SIZE)
+        except (ValueError, TypeError, KeyError) as e:
+            return Response({'error': f'Invalid grid data: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(result, status=status.HTTP_201_CREATED, headers={'ETag': f'"{result["grid_etag"]}"'})
+
+
+def job_status(job):
+    """
+    Response data of a job without its payload and result.
+    """
+    return {
+        'id': str(job.id),
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+class LocationJobs(APIView):
+    """
+    Endpoint to submit an element location run as a background job.
+    """
+
+    def post(self, request, format=None):
+        """
+        Queue the location request and return the job id, poll the job for
+        progress and fetch its result once done.
+        """
+        if not request.content_type == 'application/json':
+            return Response({'error': 'Request must contain JSON data'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data, error, error_status = location_data(request.data)
+        if error:
+            return Response(error, status=error_status)
+        if not isinstance(data.get('buildings'), dict) or not isinstance(data.get('elements'), list):
+            return Response({'error': 'Request must contain buildings and elements'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            job = submit_location_job({'buildings': data['buildings'], 'elements': data['elements']},
+                                      settings.LOCATION_JOB_WORKERS, settings.LOCATION_JOB_CHUNK_SIZE)
+        except BrokenProcessPool:
+            return Response({'error': 'Location job workers are unavailable, retry later'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=RETRY_HEADERS)
+        return Response(job_status(job), status=status.HTTP_202_ACCEPTED, headers={'Location': f'/api/jobs/{job.id}/'})
+
+
+class LocationJob(APIView):
+    """
+    Endpoint to return the status and progress of a location job.
+    """
+
+    def get(self, request, job_id, format=None):
+        try:
+            job = Job.objects.defer('payload', 'result').get(id=job_id)
+        except Job.DoesNotExist:
+            return Response({'error': 'Job does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job_status(job), status=status.HTTP_200_OK)
+
+
+class LocationJobResult(APIView):
+    """
+    Endpoint to return the [element, building, zone] rows of a finished location job.
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ElementColumnsRenderer]
+
+    def get(self, request, job_id, format=None):
+        try:
+            job = Job.objects.defer('payload').get(id=job_id)
+        except Job.DoesNotExist:
+            return Response({'error': 'Job does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        if job.status != Job.DONE:
+            return Response(job_status(job) | {'error': job.error or f'Job is {job.status}'}, status=status.HTTP_409_CONFLICT)
+        return Response(job.result, status=status.HTTP_200_OK)
+
+
+class Metrics(APIView):
+    """
+    Endpoint to return stage timings aggregated over all instrumented requests.
+    """
+
+    def get(self, request, format=None):
+        return Response(registry.snapshot() | {'zone_cache': zone_cache.stats(), 'element_writer': element_writer().stats()},
+                        status=status.HTTP_200_OK)
+
+
+def location_offload():
+    """
+    Bounded pool running location jobs of async views.
+    """
+    return bounded_executor(settings.ELEMENT_LOCATION_OFFLOAD_WORKERS, settings.ELEMENT_LOCATION_MAX_IN_FLIGHT,
+                            settings.ELEMENT_LOCATION_OFFLOAD_EXECUTOR)
+
+
+def json_body(request):
+    """
+    Return the parsed JSON body of a plain Django request, or None.
+    """
+    if not request.content_type == 'application/json':
+        return None
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+class AsyncElementLocation(View):
+    """
+    Async endpoint to return element location, the geometry work runs in a bounded pool.
+    """
+
+    async def get(self, request):
+        data = json_body(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Request must contain JSON data'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data, error, error_status = await sync_to_async(location_data)(data)
+        if error:
+            return JsonResponse(error, status=error_status)
+
+        try:
+            with stage('offload'):
+                elements = await location_offload().run(locate, data)
+        except Saturated:
+            return JsonResponse({'error': 'Too many location jobs in progress, retry later'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=RETRY_HEADERS)
+        except BrokenProcessPool:
+            return JsonResponse({'error': 'Location worker stopped, retry later'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=RETRY_HEADERS)
+        except ELEMENT_DATA_ERRORS as e:
+            return JsonResponse({'error': f'Invalid element data: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return JsonResponse({"elements": elements}, status=status.HTTP_200_OK)
+
+
+class AsyncElementInstance(View):
+    """
+    Async endpoint to create, update or delete element.
+    """
+
+    async def post(self, request):
+        data = json_body(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Request must contain JSON data'}, status=status.HTTP_400_BAD_REQUEST)
+
+        project, errors = await sync_to_async(element_project)(data.get('index'))
+        if errors:
+            return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        write = element_writer().run(project, data.get('elements', []), settings.ELEMENT_BATCH_SIZE)
+        try:
+            with stage('write_coalesce'):
+                result = await asyncio.wait_for(write, settings.ELEMENT_WRITE_TIMEOUT)
+        except TimeoutError:
+            return JsonResponse({'error': 'Element write timed out, retry later'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=RETRY_HEADERS)
+        except OperationalError as e:
+            return JsonResponse({'error': f'Element write failed, retry later: {e}'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=RETRY_HEADERS)
+        body, response_status = element_upsert_response(project, result)
+        return JsonResponse(body, status=response_status)
+
+    async def delete(self, request):
+        return await self.respond(request, element_instance_delete)
+
+    @staticmethod
+    async def respond(request, handler):
+        data = json_body(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Request must contain JSON data'}, status=status.HTTP_400_BAD_REQUEST)
+
+        body, response_status = await sync_to_async(handler)(data)
+        return JsonResponse(body, status=response_status)
@@ -43,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
+    'api.middleware.RequestDecompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,6 +83,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -124,3 +129,90 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Element location
+# Buildings of one request processed concurrently, 0 or 1 keeps them sequential.
+# 'thread' pools share the zone cache, 'process' pools keep one per worker.
+
+ELEMENT_LOCATION_WORKERS = 4
+
+ELEMENT_LOCATION_EXECUTOR = 'thread'
+
+# Async element location views run process_data in a bounded pool and answer
+# 503 once ELEMENT_LOCATION_MAX_IN_FLIGHT jobs are running or queued.
+# 'process' pools spawn their workers and replace them when one dies. Their
+# workers keep their own zone cache, so a stored grid is compiled again in
+# every worker instead of reusing the zones load_grid restored, and stage
+# metrics of the location are not reported. 'thread' pools keep both.
+
+ELEMENT_LOCATION_OFFLOAD_EXECUTOR = 'process'
+
+ELEMENT_LOCATION_OFFLOAD_WORKERS = 2
+
+ELEMENT_LOCATION_MAX_IN_FLIGHT = 8
+
+# Elements written per query by bulk element instance requests.
+
+ELEMENT_BATCH_SIZE = 500
+
+# Time the stages of every request, reported in a Server-Timing header and
+# aggregated at api/metrics/.
+
+INSTRUMENTATION = True
+
+# Request bodies sent with Content-Encoding gzip or deflate are inflated up
+# to this size, responses are gzipped when the client accepts it.
+
+REQUEST_MAX_DECOMPRESSED_SIZE = 512 * 1024 * 1024
+
+# Element listing pages, clients may ask for up to ELEMENT_PAGE_MAX_SIZE rows.
+
+ELEMENT_PAGE_SIZE = 100
+
+ELEMENT_PAGE_MAX_SIZE = 1000
+
+# Element status summaries are cached per project until its elements change.
+# The version keys live in this cache too, so processes serving the same
+# projects need a shared backend such as FileBasedCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'assembly-manager',
+    }
+}
+
+ELEMENT_STATUS_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Element instance writes of concurrent requests are committed together by
+# one writer thread: writes arriving within ELEMENT_WRITE_WINDOW seconds of
+# the first one share its transaction, up to ELEMENT_WRITE_MAX_BATCH writes.
+# A failed commit fails every write of the batch. Requests wait at most
+# ELEMENT_WRITE_TIMEOUT seconds for their write and answer 503 after that.
+
+ELEMENT_WRITE_WINDOW = 0.005
+
+ELEMENT_WRITE_MAX_BATCH = 64
+
+ELEMENT_WRITE_TIMEOUT = 30
+
+# PRAGMAs run on every new SQLite connection. WAL lets readers run while the
+# writer commits, busy_timeout makes a blocked writer wait instead of failing
+# with "database is locked".
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+}
+
+# Location jobs run in spawned worker processes, results and progress are
+# stored on management.Job. Progress is updated after every chunk of
+# LOCATION_JOB_CHUNK_SIZE elements. A pool whose worker died is replaced and
+# its running jobs fail; as the server process owns the pool, jobs found
+# running when a pool starts are failed too.
+
+LOCATION_JOB_WORKERS = 2
+
+LOCATION_JOB_CHUNK_SIZE = 5000
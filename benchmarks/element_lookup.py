@@ -0,0 +1,120 @@
+"""
+Element and project lookup cost as the element table grows.
+
+Runs against a throwaway SQLite database, once migrated to the initial schema
+and once to the latest one, and reports per lookup the number of queries, the
+mean latency and the SQLite query plan.
+
+    python -m benchmarks.element_lookup --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'assembly_manager.settings')
+from django.conf import settings
+
+DB_FILE = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+settings.DATABASES['default']['NAME'] = DB_FILE
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from management.models import Element, Project
+
+PROJECTS = 100
+# Columns present since the initial schema, so every lookup runs on both.
+PROJECT_FIELDS = ('id', 'index')
+ELEMENT_FIELDS = ('id', 'project', 'element_name', 'coord_x', 'coord_y', 'coord_z', 'rotation')
+
+
+def populate(size: int, seed=0):
+    """
+    Fill the tables with size elements spread over PROJECTS projects.
+    """
+    rnd = random.Random(seed)
+    rows = ((i + 1, rnd.randint(1, PROJECTS), f'E_{i}', rnd.uniform(0, 1e5), rnd.uniform(0, 1e5), 0.0, 0.0) for i in range(size))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM management_element')
+        cursor.execute('DELETE FROM management_project')
+        # grid_version is NOT NULL from migration 0004 on.
+        columns = {x.name for x in connection.introspection.get_table_description(cursor, 'management_project')}
+        if 'grid_version' in columns:
+            sql = 'INSERT INTO management_project (id, "index", grid_version) VALUES (%s, %s, 0)'
+        else:
+            sql = 'INSERT INTO management_project (id, "index") VALUES (%s, %s)'
+        cursor.executemany(sql, [(i + 1, f'P{i:04d}') for i in range(PROJECTS)])
+        cursor.executemany(
+            'INSERT INTO management_element (id, project_id, element_name, coord_x, coord_y, coord_z, rotation) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+            list(rows))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def lookups(size: int) -> dict:
+    projects = Project.objects.only(*PROJECT_FIELDS)
+    elements = Element.objects.only(*ELEMENT_FIELDS)
+    element = elements.get(id=size // 2 + 1)
+    project = projects.get(id=element.project_id)
+    return {
+        'project_index': lambda: projects.get(index=project.index),
+        'element_identity': lambda: elements.get(
+            project=project, element_name=element.element_name, coord_x=element.coord_x,
+            coord_y=element.coord_y, coord_z=element.coord_z, rotation=element.rotation),
+        'element_name': lambda: list(elements.filter(project=project, element_name=element.element_name)),
+    }
+
+
+def query_plan(func) -> str:
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + queries[-1]['sql'])
+        return '; '.join(row[-1] for row in cursor.fetchall())
+
+
+def measure(func, repeat: int) -> dict:
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return {'queries': len(queries), 'mean_ms': (time.perf_counter() - start_time) / repeat * 1000, 'plan': query_plan(func)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    try:
+        for schema in ('0001', None):
+            call_command('migrate', 'management', *([schema] if schema else []), verbosity=0)
+            for size in args.sizes:
+                populate(size)
+                for name, func in lookups(size).items():
+                    result = {'schema': schema or 'latest', 'elements': size, 'lookup': name} | measure(func, args.repeat)
+                    results.append(result)
+                    print(f"{result['schema']:>7} {size:>9} {name:<17} {result['queries']} queries "
+                          f"{result['mean_ms']:8.3f} ms  {result['plan']}")
+    finally:
+        connection.close()
+        os.remove(DB_FILE)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Bounds window lookup cost across the extent of a project.
+
+Runs against a throwaway SQLite database and reports, for windows at the
+low, middle and high x end of the project, the candidates found and the mean
+latency of the bounds column filter and of the R*Tree query.
+
+    python -m benchmarks.element_query --sizes 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'assembly_manager.settings')
+from django.conf import settings
+
+DB_FILE = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+settings.DATABASES['default']['NAME'] = DB_FILE
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from api.components.element_query import bounds_candidates, BOUNDS_FIELDS
+from management.models import Element, Project
+
+EXTENT = 1e6
+WINDOW = 20000.0
+POSITIONS = {'low_x': 0.01, 'mid_x': 0.5, 'high_x': 0.99}
+
+
+def populate(size: int, seed=0) -> Project:
+    """
+    Fill one project with size elements of up to 1 m spread over EXTENT mm squared.
+    """
+    rnd = random.Random(seed)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM management_element')
+        cursor.execute('DELETE FROM management_project')
+        project = Project.objects.create(index='QUERY')
+        rows = []
+        for i in range(size):
+            x, y = rnd.uniform(0, EXTENT), rnd.uniform(0, EXTENT)
+            rows.append((project.id, f'E_{i}', x, y, x + rnd.uniform(0, 1000), y + rnd.uniform(0, 1000)))
+        cursor.executemany('INSERT INTO management_element (project_id, element_name, min_x, min_y, max_x, max_y) '
+                           'VALUES (%s, %s, %s, %s, %s, %s)', rows)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return project
+
+
+def column_candidates(project, min_x, min_y, max_x, max_y) -> list:
+    return list(Element.objects.filter(project=project, min_x__lte=max_x, max_x__gte=min_x, min_y__lte=max_y,
+                                       max_y__gte=min_y).values_list('id', *BOUNDS_FIELDS))
+
+
+def measure(func, args: tuple, repeat: int) -> dict:
+    found = len(func(*args))
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return {'candidates': found, 'mean_ms': (time.perf_counter() - start_time) / repeat * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    try:
+        call_command('migrate', verbosity=0)
+        for size in args.sizes:
+            project = populate(size)
+            for position, ratio in POSITIONS.items():
+                x = y = ratio * (EXTENT - WINDOW)
+                window = (project, x, y, x + WINDOW, y + WINDOW)
+                for lookup, func in (('columns', column_candidates), ('rtree', bounds_candidates)):
+                    result = {'elements': size, 'window': position, 'lookup': lookup} | measure(func, window, args.repeat)
+                    results.append(result)
+                    print(f"{size:>9} {position:<7} {lookup:<8} {result['candidates']:>5} candidates "
+                          f"{result['mean_ms']:9.3f} ms")
+    finally:
+        connection.close()
+        os.remove(DB_FILE)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Scaling benchmark of the element location engine.
+
+Generates synthetic buildings (orthogonal or skewed grids) and element sets
+(size or boundary based), times every stage of process_data separately and
+writes the results as JSON so runs of different commits can be compared.
+
+    python -m benchmarks.location_engine --axes 10 100 --elements 1000 100000 --output results.json
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+
+import numpy as np
+import shapely
+from shapely import affinity
+
+from api.components.element_location import (elements_geometry, intersection_recognition, line_area_recognition,
+                                             process_data, unit_recognition, zone_analyze, AREA_SIZE, STAGES, ZoneSet)
+from api.components.orthogonal_grid import orthogonal_grid
+from api.components.zone_cache import ZoneCache
+
+
+def generate_grid(axes: int, spacing=6000.0, skew=0.0, origin=(0.0, 0.0)) -> dict:
+    """
+    Grid of axes split over two families, the second one tilted by skew degrees.
+    """
+    count1 = axes - axes // 2
+    count2 = axes // 2
+    e1, e2 = grid_directions(skew)
+    ox, oy = origin
+    start, end = -0.5 * spacing, (max(count1, count2) - 0.5) * spacing
+
+    grid_lines = {}
+    for i in range(count1):
+        p1, p2 = i * spacing * e1 + start * e2, i * spacing * e1 + end * e2
+        grid_lines[str(i + 1)] = [[ox + p1[0], oy + p1[1]], [ox + p2[0], oy + p2[1]]]
+    for j in range(count2):
+        p1, p2 = start * e1 + j * spacing * e2, end * e1 + j * spacing * e2
+        grid_lines[axis_label(j)] = [[ox + p1[0], oy + p1[1]], [ox + p2[0], oy + p2[1]]]
+    return {"grid_lines": grid_lines}
+
+
+def generate_buildings(buildings: int, axes: int, spacing=6000.0, skew=0.0) -> dict:
+    """
+    Buildings placed side by side so their grids do not overlap.
+    """
+    width = (axes + 2) * spacing
+    return {f"B{b + 1}": generate_grid(axes, spacing, skew, origin=(b * width, 0.0)) for b in range(buildings)}
+
+
+def generate_elements(buildings: dict, count: int, kind='size', spacing=6000.0, skew=0.0, seed=0) -> list:
+    """
+    Columns at intersections, walls along axes and slabs inside cells.
+    """
+    rnd = random.Random(seed)
+    e1, e2 = grid_directions(skew)
+    wall_rotation = math.degrees(math.atan2(e2[1], e2[0]))
+    origins = [np.array(b_data["grid_lines"]["1"][0]) + 0.5 * spacing * e2 for b_data in buildings.values()]
+    cells = [(sum(1 for x in b_data["grid_lines"] if x.isdigit()), sum(1 for x in b_data["grid_lines"] if not x.isdigit()))
+             for b_data in buildings.values()]
+
+    elements = []
+    for id_e in range(count):
+        id_b = rnd.randrange(len(origins))
+        i, j = rnd.randrange(max(cells[id_b][0] - 1, 1)), rnd.randrange(max(cells[id_b][1] - 1, 1))
+        corner = origins[id_b] + i * spacing * e1 + j * spacing * e2
+        shape = rnd.random()
+        if shape < 0.4:
+            coords, rotation, size = corner - 200 * e1 - 200 * e2, 0.0, (400.0, 400.0)
+        elif shape < 0.7 and rnd.random() < 0.5:
+            coords, rotation, size = corner + 0.15 * spacing * e1 - 100 * e2, 0.0, (0.7 * spacing, 200.0)
+        elif shape < 0.7:
+            coords, rotation, size = corner + 0.15 * spacing * e2 + 100 * e1, wall_rotation, (0.7 * spacing, 200.0)
+        else:
+            coords, rotation, size = corner + 0.3 * spacing * (e1 + e2), 0.0, (0.4 * spacing, 0.4 * spacing * e2[1])
+
+        element = {"element_name": f"E_{id_e}", "coords": [float(coords[0]), float(coords[1]), 0.0], "rotation": [rotation]}
+        if kind == 'size':
+            element["size"] = [size[0], size[1], 3000.0]
+        else:
+            polygon = affinity.rotate(shapely.box(coords[0], coords[1], coords[0] + size[0], coords[1] + size[1]),
+                                        rotation, origin=tuple(coords[:2]))
+            element["boundary"] = [[x, y, 0.0] for x, y in polygon.exterior.coords[:-1]]
+        elements.append(element)
+    return elements
+
+
+def grid_directions(skew: float):
+    angle = math.radians(skew)
+    return np.array([1.0, 0.0]), np.array([math.sin(angle), math.cos(angle)])
+
+
+def axis_label(j: int) -> str:
+    label = ''
+    j += 1
+    while j:
+        j, rest = divmod(j - 1, 26)
+        label = chr(65 + rest) + label
+    return label
+
+
+def timed(timings: dict, name: str, func, *args, **kwargs):
+    start_time = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[name] = timings.get(name, 0.0) + time.perf_counter() - start_time
+    return result
+
+
+def run_case(data: dict) -> dict:
+    """
+    Run the process_data stages one by one, sequentially over buildings.
+    """
+    timings = {}
+    counts = {'elements': len(data['elements']), 'intersections': 0, 'point_zones': 0, 'line_zones': 0, 'area_zones': 0}
+    counts.update({f'{stage}_found': 0 for stage in STAGES})
+
+    elements = timed(timings, 'elements_geometry', elements_geometry, data['elements'])
+    unit = timed(timings, 'unit_recognition', unit_recognition, data)
+    for b_name, b_data in data['buildings'].items():
+        intersections = timed(timings, 'intersection_recognition', intersection_recognition, b_data)
+        line_zones, area_zones = timed(timings, 'line_area_recognition', line_area_recognition, intersections, unit)
+        zone_sets = {
+            'point': timed(timings, 'point_zone_set', ZoneSet, intersections, unit, quad_segs=3),
+            'line': timed(timings, 'line_zone_set', ZoneSet, line_zones, unit),
+            'area': timed(timings, 'area_zone_set', ZoneSet, area_zones, unit),
+        }
+        orthogonal = timed(timings, 'orthogonal_grid', orthogonal_grid, b_data, intersections, AREA_SIZE[unit]) \
+            if unit in AREA_SIZE else None
+        counts['intersections'] += len(intersections)
+        # Same order as building_analyze: the arithmetic pass on orthogonal
+        # grids first, the Shapely stages on what it leaves unresolved.
+        if orthogonal is not None and elements.unresolved.any():
+            fast_located = timed(timings, 'orthogonal_analyze', orthogonal.locate, elements, zone_sets.__getitem__)
+            for stage, found in zip(STAGES, fast_located):
+                counts[f'{stage}_found'] += len(found)
+        for stage in STAGES:
+            counts[f'{stage}_zones'] += len(zone_sets[stage])
+            if elements.unresolved.any():
+                found = timed(timings, f'{stage}_analyze', zone_analyze, elements, zone_sets[stage], b_name)
+                counts[f'{stage}_found'] += len(found)
+
+    cache = ZoneCache()
+    timed(timings, 'process_data_cold', process_data, data, cache=cache)
+    timed(timings, 'process_data_warm', process_data, data, cache=cache)
+    counts['not_found'] = len(elements.pending())
+    return {'timings': timings, 'counts': counts}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--axes', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--elements', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--buildings', type=int, nargs='+', default=[1])
+    parser.add_argument('--skew', type=float, nargs='+', default=[0.0, 5.0], help='tilt of the second axis family in degrees')
+    parser.add_argument('--kind', nargs='+', choices=['size', 'boundary'], default=['size', 'boundary'])
+    parser.add_argument('--spacing', type=float, default=6000.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    cases = []
+    for axes in args.axes:
+        for buildings in args.buildings:
+            for skew in args.skew:
+                grid = generate_buildings(buildings, axes, args.spacing, skew)
+                for count in args.elements:
+                    for kind in args.kind:
+                        params = {'axes': axes, 'buildings': buildings, 'skew': skew, 'elements': count, 'kind': kind}
+                        data = {'buildings': grid, 'elements': generate_elements(grid, count, kind, args.spacing, skew, args.seed)}
+                        case = {'params': params} | run_case(data)
+                        cases.append(case)
+                        stages = ' '.join(f"{k}={v:.3f}" for k, v in case['timings'].items())
+                        print(f"axes={axes} buildings={buildings} skew={skew} elements={count} kind={kind}: {stages}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'shapely': shapely.__version__,
+                'numpy': np.__version__,
+                'cases': cases,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
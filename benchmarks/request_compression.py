@@ -0,0 +1,113 @@
+"""
+Throughput and memory of compressed request bodies.
+
+Builds gzip compressed element instance payloads of the requested sizes
+without holding them uncompressed, then inflates them the way
+RequestDecompressionMiddleware does: read in chunks through the decompressing
+stream, and read whole as a view reading request.body would. Peak memory is
+the Python allocation peak reported by tracemalloc.
+
+    python -m benchmarks.request_compression --sizes 100 300 --output results.json
+"""
+import argparse
+import gzip
+import io
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+from api.components.decompression import decompressed
+from benchmarks.location_engine import git_commit
+
+MB = 1024 * 1024
+
+
+def generate_payload(size_mb: int, level: int, seed=0) -> tuple:
+    """
+    Gzip compressed element instance request of about size_mb uncompressed megabytes.
+    """
+    rnd = random.Random(seed)
+    target = size_mb * MB
+    written = 0
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=level) as f:
+        f.write(b'{"index": "BENCH", "elements": [')
+        id_e = 0
+        while written < target:
+            chunk = ','.join(json.dumps({
+                "element_name": f"E_{id_e + i}",
+                "coord_x": rnd.randint(0, 100000),
+                "coord_y": rnd.randint(0, 100000),
+                "coord_z": rnd.choice([0, 3000, 6000]),
+                "rotation": rnd.choice([0, 90]),
+                "assembly_status": False,
+                "production_status": "Planned",
+            }) for i in range(1000))
+            f.write((',' if id_e else '').encode() + chunk.encode())
+            written += len(chunk)
+            id_e += 1000
+        f.write(b']}')
+    return buffer.getvalue(), written
+
+
+def measure(func) -> tuple:
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    size = func()
+    duration = time.perf_counter() - start_time
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, duration, peak
+
+
+def run_case(size_mb: int, level: int, chunk_size: int) -> dict:
+    payload, _ = generate_payload(size_mb, level)
+
+    def streamed():
+        stream = decompressed(io.BytesIO(payload), 'gzip', 2**63)
+        size = 0
+        while chunk := stream.read(chunk_size):
+            size += len(chunk)
+        return size
+
+    def whole():
+        return len(decompressed(io.BytesIO(payload), 'gzip', 2**63).read())
+
+    results = {'compressed_mb': len(payload) / MB}
+    for name, func in (('streamed', streamed), ('whole', whole)):
+        size, duration, peak = measure(func)
+        results['uncompressed_mb'] = size / MB
+        results[name] = {'seconds': duration, 'mb_per_second': size / MB / duration, 'peak_mb': peak / MB}
+    results['ratio'] = results['uncompressed_mb'] / results['compressed_mb']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 300], help='uncompressed payload sizes in MB')
+    parser.add_argument('--level', type=int, default=6, help='gzip compression level')
+    parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    cases = []
+    for size_mb in args.sizes:
+        case = {'params': {'size_mb': size_mb, 'level': args.level, 'chunk_size': args.chunk_size}} | run_case(size_mb, args.level, args.chunk_size)
+        cases.append(case)
+        print(f"size={size_mb}MB compressed={case['compressed_mb']:.1f}MB ratio={case['ratio']:.1f} "
+              f"streamed={case['streamed']['mb_per_second']:.0f}MB/s peak={case['streamed']['peak_mb']:.1f}MB "
+              f"whole={case['whole']['mb_per_second']:.0f}MB/s peak={case['whole']['peak_mb']:.1f}MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'cases': cases,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
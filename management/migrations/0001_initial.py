@@ -0,0 +1,44 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Project',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('index', models.CharField(max_length=100)),
+                ('name', models.CharField(blank=True, max_length=255, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Element',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('element_name', models.CharField(max_length=255)),
+                ('coord_x', models.FloatField(blank=True, null=True)),
+                ('coord_y', models.FloatField(blank=True, null=True)),
+                ('coord_z', models.FloatField(blank=True, null=True)),
+                ('rotation', models.FloatField(blank=True, null=True)),
+                ('production_date', models.DateField(blank=True, null=True)),
+                ('production_status', models.CharField(blank=True, max_length=100, null=True)),
+                ('transport_date', models.DateField(blank=True, null=True)),
+                ('transport_status', models.CharField(blank=True, max_length=100, null=True)),
+                ('planned_assembly_date', models.DateField(blank=True, null=True)),
+                ('assembly_date', models.DateField(blank=True, null=True)),
+                ('assembly_status', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_by', models.CharField(blank=True, max_length=100, null=True)),
+                ('modified_by', models.CharField(blank=True, max_length=100, null=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='management.project')),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='index',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='element',
+            index=models.Index(fields=['project', 'element_name', 'coord_x', 'coord_y', 'coord_z', 'rotation'], name='element_identity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='element',
+            index=models.Index(fields=['project', 'element_name'], name='element_project_name_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0002_element_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='element',
+            name='location_building',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='element',
+            name='location_grid',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='element',
+            name='location_signature',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='element',
+            name='location_zone',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0003_element_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='grid_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Building',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('unit', models.CharField(max_length=20)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('etag', models.CharField(max_length=64)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buildings', to='management.project')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GridLine',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('vertices', models.JSONField()),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grid_lines', to='management.building')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('stage', models.CharField(max_length=10)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('name', models.CharField(max_length=255)),
+                ('area', models.FloatField()),
+                ('geometry', models.BinaryField()),
+                ('min_x', models.FloatField()),
+                ('min_y', models.FloatField()),
+                ('max_x', models.FloatField()),
+                ('max_y', models.FloatField()),
+                ('core_min_x', models.FloatField()),
+                ('core_min_y', models.FloatField()),
+                ('core_max_x', models.FloatField()),
+                ('core_max_y', models.FloatField()),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zones', to='management.building')),
+            ],
+            options={
+                'ordering': ['stage', 'position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='building',
+            constraint=models.UniqueConstraint(fields=('project', 'name'), name='building_project_name_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='zone',
+            index=models.Index(fields=['building', 'stage', 'position'], name='zone_building_stage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='zone',
+            index=models.Index(fields=['building', 'name'], name='zone_building_name_idx'),
+        ),
+    ]
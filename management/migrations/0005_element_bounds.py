@@ -0,0 +1,45 @@
+# Generated by Django 5.0.2 on 2026-10-18 21:04
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def point_bounds(apps, schema_editor):
+    Element = apps.get_model('management', 'Element')
+    Element.objects.filter(coord_x__isnull=False, coord_y__isnull=False) \
+        .update(min_x=F('coord_x'), min_y=F('coord_y'), max_x=F('coord_x'), max_y=F('coord_y'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0004_building_grid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='element',
+            name='max_x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='element',
+            name='max_y',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='element',
+            name='min_x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='element',
+            name='min_y',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='element',
+            index=models.Index(fields=['project', 'min_x', 'max_x', 'min_y', 'max_y'], name='element_bounds_idx'),
+        ),
+        migrations.RunPython(point_bounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.2 on 2026-10-19 09:12
+
+from django.db import migrations
+
+# R*Tree of element bounds kept in sync with management_element by triggers.
+# The project id is an auxiliary column: as a zero width dimension it would
+# defeat the node splits. R*Tree boxes are 32-bit floats rounded outward,
+# queries check the exact bounds columns as well.
+RTREE_SQL = [
+    'CREATE VIRTUAL TABLE management_element_rtree USING rtree(id, min_x, max_x, min_y, max_y, +project_id)',
+    '''INSERT INTO management_element_rtree
+        SELECT id, min_x, max_x, min_y, max_y, project_id FROM management_element
+        WHERE min_x IS NOT NULL AND min_y IS NOT NULL AND max_x IS NOT NULL AND max_y IS NOT NULL''',
+    '''CREATE TRIGGER management_element_rtree_insert AFTER INSERT ON management_element
+        WHEN NEW.min_x IS NOT NULL AND NEW.min_y IS NOT NULL AND NEW.max_x IS NOT NULL AND NEW.max_y IS NOT NULL
+        BEGIN
+            INSERT INTO management_element_rtree
+            VALUES (NEW.id, NEW.min_x, NEW.max_x, NEW.min_y, NEW.max_y, NEW.project_id);
+        END''',
+    '''CREATE TRIGGER management_element_rtree_update
+        AFTER UPDATE OF project_id, min_x, min_y, max_x, max_y ON management_element
+        BEGIN
+            DELETE FROM management_element_rtree WHERE id = OLD.id;
+            INSERT INTO management_element_rtree
+            SELECT NEW.id, NEW.min_x, NEW.max_x, NEW.min_y, NEW.max_y, NEW.project_id
+            WHERE NEW.min_x IS NOT NULL AND NEW.min_y IS NOT NULL AND NEW.max_x IS NOT NULL AND NEW.max_y IS NOT NULL;
+        END''',
+    '''CREATE TRIGGER management_element_rtree_delete AFTER DELETE ON management_element
+        BEGIN
+            DELETE FROM management_element_rtree WHERE id = OLD.id;
+        END''',
+]
+
+DROP_RTREE_SQL = [
+    'DROP TRIGGER IF EXISTS management_element_rtree_delete',
+    'DROP TRIGGER IF EXISTS management_element_rtree_update',
+    'DROP TRIGGER IF EXISTS management_element_rtree_insert',
+    'DROP TABLE IF EXISTS management_element_rtree',
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0006_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(RTREE_SQL), run_sqlite(DROP_RTREE_SQL)),
+    ]
@@ -1,10 +1,13 @@
+import uuid
+
 from django.db import models
 
 
 class Project(models.Model):
     id = models.AutoField(primary_key=True)
-    index = models.CharField(max_length=100)
+    index = models.CharField(max_length=100, unique=True)
     name = models.CharField(max_length=255, null=True, blank=True)
+    grid_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"[{self.id}] {self.index} - {self.name}"
@@ -27,7 +30,109 @@ class Element(models.Model):
     assembly_status = models.CharField(max_length=100, null=True, blank=True)
     created_by = models.CharField(max_length=100, null=True, blank=True)
     modified_by = models.CharField(max_length=100, null=True, blank=True)
+    location_building = models.CharField(max_length=255, null=True, blank=True)
+    location_zone = models.CharField(max_length=255, null=True, blank=True)
+    location_signature = models.CharField(max_length=64, null=True, blank=True)
+    location_grid = models.CharField(max_length=64, null=True, blank=True)
+    min_x = models.FloatField(null=True, blank=True)
+    min_y = models.FloatField(null=True, blank=True)
+    max_x = models.FloatField(null=True, blank=True)
+    max_y = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'element_name', 'coord_x', 'coord_y', 'coord_z', 'rotation'], name='element_identity_idx'),
+            models.Index(fields=['project', 'element_name'], name='element_project_name_idx'),
+            models.Index(fields=['project', 'min_x', 'max_x', 'min_y', 'max_y'], name='element_bounds_idx'),
+        ]
 
     def __str__(self):
         return f"{self.element_name} ({self.id})"
 
+
+
+class Building(models.Model):
+    id = models.AutoField(primary_key=True)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='buildings')
+    name = models.CharField(max_length=255)
+    position = models.PositiveIntegerField(default=0)
+    unit = models.CharField(max_length=20)
+    version = models.PositiveIntegerField(default=1)
+    etag = models.CharField(max_length=64)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'name'], name='building_project_name_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} v{self.version} ({self.project.index})"
+
+
+class GridLine(models.Model):
+    id = models.AutoField(primary_key=True)
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='grid_lines')
+    name = models.CharField(max_length=100)
+    position = models.PositiveIntegerField(default=0)
+    vertices = models.JSONField()
+
+    class Meta:
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.name} ({self.building.name})"
+
+
+class Zone(models.Model):
+    id = models.AutoField(primary_key=True)
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='zones')
+    stage = models.CharField(max_length=10)
+    position = models.PositiveIntegerField(default=0)
+    name = models.CharField(max_length=255)
+    area = models.FloatField()
+    geometry = models.BinaryField()
+    min_x = models.FloatField()
+    min_y = models.FloatField()
+    max_x = models.FloatField()
+    max_y = models.FloatField()
+    core_min_x = models.FloatField()
+    core_min_y = models.FloatField()
+    core_max_x = models.FloatField()
+    core_max_y = models.FloatField()
+
+    class Meta:
+        ordering = ['stage', 'position']
+        indexes = [
+            models.Index(fields=['building', 'stage', 'position'], name='zone_building_stage_idx'),
+            models.Index(fields=['building', 'name'], name='zone_building_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.stage} {self.name} ({self.building.name})"
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUSES, default=QUEUED)
+    payload = models.JSONField()
+    progress = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"